@@ -1,10 +1,9 @@
+from time import perf_counter
+
 import numpy as np
 import pandas as pd
-from imblearn.over_sampling import SMOTE
-from sklearn.decomposition import PCA
-from sklearn.impute import KNNImputer
-from sklearn.preprocessing import StandardScaler
 
+from air_pressure.model.model_artifact import Model_Artifact
 from air_pressure.s3_bucket_operations.s3_operations import S3_Operation
 from utils.logger import App_Logger
 from utils.read_params import get_log_dic, read_params
@@ -34,8 +33,22 @@ class Preprocessor:
 
         self.input_files_bucket = self.config["s3_bucket"]["input_files_bucket"]
 
+        self.imbalance_config = self.config["imbalance"]
+
+        self.imbalance_strategy = self.imbalance_config["strategy"]
+
+        self.random_state = self.config["base"]["random_state"]
+
+        self.train_model_dir = self.config["model_dir"]["trained"]
+
+        self.model_bucket = self.config["s3_bucket"]["air_pressure_model_bucket"]
+
+        self.preprocessing_pipeline_name = self.config["preprocessing_pipeline"]
+
         self.s3 = S3_Operation()
 
+        self.model_artifact = Model_Artifact()
+
     def remove_columns(self, data, columns):
         """
         Method Name :   remove_columns
@@ -63,7 +76,11 @@ class Preprocessor:
         try:
             self.useful_data = self.data.drop(labels=self.columns, axis=1)
 
-            self.log_writer.log(f"Dropped {columns} from {data}", **log_dic)
+            self.log_writer.log(
+                "Dropped %s from data with shape %s", columns, data.shape, **log_dic
+            )
+
+            self.log_writer.debug_log("Dropped %s from %s", columns, data, **log_dic)
 
             self.log_writer.start_log("exit", **log_dic)
 
@@ -97,7 +114,16 @@ class Preprocessor:
 
             self.Y = data[label_column_name]
 
-            self.log_writer.log(f"Separated {label_column_name} from {data}", **log_dic)
+            self.log_writer.log(
+                "Separated %s from data with shape %s",
+                label_column_name,
+                data.shape,
+                **log_dic,
+            )
+
+            self.log_writer.debug_log(
+                "Separated %s from %s", label_column_name, data, **log_dic
+            )
 
             self.log_writer.start_log("exit", **log_dic)
 
@@ -168,7 +194,16 @@ class Preprocessor:
         try:
             self.null_counts = data.isna().sum()
 
-            self.log_writer.log(f"Null values count is : {self.null_counts}", **log_dic)
+            self.log_writer.log(
+                "Null values count is : %s in %s columns",
+                self.null_counts.sum(),
+                (self.null_counts > 0).sum(),
+                **log_dic,
+            )
+
+            self.log_writer.debug_log(
+                "Null values count is : %s", self.null_counts, **log_dic
+            )
 
             for i in range(len(self.null_counts)):
                 if self.null_counts[i] > 0:
@@ -247,12 +282,13 @@ class Preprocessor:
         except Exception as e:
             self.log_writer.exception_log(e, **log_dic)
 
-    def impute_missing_values(self, data):
+    def fit_preprocessing_pipeline(self, X):
         """
-        Method Name :   impute_missing_values
-        Description :   This method replaces all the missing values in the dataframe using mean values of the column.
-        
-        Output      :   A dataframe which has all the missing values imputed.
+        Method Name :   fit_preprocessing_pipeline
+        Description :   This method fits the KNN imputer, standard scaler and PCA on the features as one pipeline, the
+                        fitted pipeline is kept so that it is saved and applied as it is during prediction
+
+        Output      :   A dataframe with principal components of the features
         On Failure  :   Write an exception log and then raise an exception
 
         Version     :   1.2
@@ -260,79 +296,86 @@ class Preprocessor:
         """
         log_dic = get_log_dic(
             self.__class__.__name__,
-            self.impute_missing_values.__name__,
+            self.fit_preprocessing_pipeline.__name__,
             __file__,
             self.log_file,
         )
 
         self.log_writer.start_log("start", **log_dic)
 
-        self.data = data
-
         try:
-            imputer = KNNImputer(
-                n_neighbors=self.knn_neighbours,
-                weights=self.knn_weights,
-                missing_values=np.nan,
+            from sklearn.decomposition import PCA
+            from sklearn.impute import KNNImputer
+            from sklearn.pipeline import Pipeline
+            from sklearn.preprocessing import StandardScaler
+
+            self.preprocessing_pipeline = Pipeline(
+                [
+                    (
+                        "imputer",
+                        KNNImputer(
+                            n_neighbors=self.knn_neighbours,
+                            weights=self.knn_weights,
+                            missing_values=np.nan,
+                        ),
+                    ),
+                    ("scaler", StandardScaler()),
+                    ("pca", PCA(n_components=self.n_components)),
+                ]
             )
 
-            self.log_writer.log(f"Initialized {imputer.__class__.__name__}", **log_dic)
-
-            self.new_array = imputer.fit_transform(self.data)
-
-            self.new_data = pd.DataFrame(data=self.new_array, columns=self.data.columns)
+            self.log_writer.log(
+                f"Initialized preprocessing pipeline with {[name for name, _ in self.preprocessing_pipeline.steps]} as steps",
+                **log_dic,
+            )
 
-            self.log_writer.log("Created new dataframe with imputed values", **log_dic)
+            principal_x = pd.DataFrame(
+                self.preprocessing_pipeline.fit_transform(X), index=X.index
+            )
 
-            self.log_writer.log("Imputing missing values Successful", **log_dic)
+            self.log_writer.log(
+                f"Fitted preprocessing pipeline on {X.shape[1]} features and transformed the data to {principal_x.shape[1]} components",
+                **log_dic,
+            )
 
             self.log_writer.start_log("exit", **log_dic)
 
-            return self.new_data
+            return principal_x
 
         except Exception as e:
-            raise e
+            self.log_writer.exception_log(e, **log_dic)
 
-    def apply_pca_transform(self, X_scaled_data):
+    def apply_preprocessing_pipeline(self, data, preprocessing_pipeline):
         """
-        Method Name : apply_pca_transform
-        Description : This method applies the PCA transformation the features cols
-        
-        Output      : A dataframe with scaled values
-        On Failure  : Write an exception log and then raise an exception
+        Method Name :   apply_preprocessing_pipeline
+        Description :   This method selects the features which the preprocessing pipeline was fitted on, and transforms
+                        them with the fitted pipeline
+
+        Output      :   A dataframe with principal components of the features
+        On Failure  :   Write an exception log and then raise an exception
 
-        Version     : 1.2
-        Revisions   : moved setup to cloud
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
         """
         log_dic = get_log_dic(
             self.__class__.__name__,
-            self.apply_pca_transform.__name__,
+            self.apply_preprocessing_pipeline.__name__,
             __file__,
             self.log_file,
         )
 
-        try:
-            self.log_writer.start_log("start", **log_dic)
-
-            pca = PCA(n_components=self.n_components)
-
-            pca_model_name = pca.__class__.__name__
-
-            self.log_writer.log(
-                f"Initialized {pca_model_name} model with n_components to {self.n_components}",
-                **log_dic,
-            )
+        self.log_writer.start_log("start", **log_dic)
 
-            new_data = pca.fit_transform(X_scaled_data)
+        try:
+            feature_cols = list(preprocessing_pipeline[0].feature_names_in_)
 
-            self.log_writer.log(
-                f"Transformed the data using {pca_model_name} model", **log_dic
+            principal_x = pd.DataFrame(
+                preprocessing_pipeline.transform(data[feature_cols]), index=data.index
             )
 
-            principal_x = pd.DataFrame(new_data, index=self.data.index)
-
             self.log_writer.log(
-                "Created a dataframe for the transformed data", **log_dic
+                f"Transformed {len(data)} rows with the preprocessing pipeline",
+                **log_dic,
             )
 
             self.log_writer.start_log("exit", **log_dic)
@@ -342,20 +385,21 @@ class Preprocessor:
         except Exception as e:
             self.log_writer.exception_log(e, **log_dic)
 
-    def scale_numerical_columns(self, data):
+    def save_preprocessing_pipeline(self):
         """
-        Method Name : scale_numerical_columns
-        Description : This method scales the numerical values using the Standard scaler.
-        
-        Output      : A dataframe with scaled values
-        On Failure  : Write an exception log and then raise an exception
+        Method Name :   save_preprocessing_pipeline
+        Description :   This method saves the fitted preprocessing pipeline to the trained models dir of model bucket
+                        as a model artifact, it is moved to the prod models dir together with the production model
 
-        Version     : 1.2
-        Revisions   : moved setup to cloud
+        Output      :   The preprocessing pipeline is saved in model bucket
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
         """
         log_dic = get_log_dic(
             self.__class__.__name__,
-            self.scale_numerical_columns.__name__,
+            self.save_preprocessing_pipeline.__name__,
             __file__,
             self.log_file,
         )
@@ -363,30 +407,24 @@ class Preprocessor:
         self.log_writer.start_log("start", **log_dic)
 
         try:
-            self.data = data
-
-            self.scaler = StandardScaler()
-
-            self.log_writer.log(
-                f"Initialized {self.scaler.__class__.__name__}", **log_dic
+            self.s3.save_model(
+                self.preprocessing_pipeline,
+                self.train_model_dir,
+                self.model_bucket,
+                self.log_file,
+                model_bytes=self.model_artifact.dump_artifact(
+                    self.preprocessing_pipeline, self.log_file
+                ),
+                model_name=self.preprocessing_pipeline_name,
             )
 
-            self.scaled_data = self.scaler.fit_transform(self.data)
-
             self.log_writer.log(
-                f"Transformed data using {self.scaler.__class__.__name__}", **log_dic
-            )
-
-            self.scaled_num_df = pd.DataFrame(
-                data=self.scaled_data, columns=self.data.columns, index=self.data.index
+                f"Saved preprocessing pipeline as {self.preprocessing_pipeline_name} in {self.model_bucket} bucket",
+                **log_dic,
             )
 
-            self.log_writer.log("Converted transformed data to dataframe", **log_dic)
-
             self.log_writer.start_log("exit", **log_dic)
 
-            return self.scaled_num_df
-
         except Exception as e:
             self.log_writer.exception_log(e, **log_dic)
 
@@ -425,12 +463,77 @@ class Preprocessor:
             self.log_writer.exception_log(e, **log_dic)
 
     def handleImbalance(self, X, Y):
+        """
+        Method Name :   handleImbalance
+        Description :   This method handles the class imbalance using the strategy from imbalance section of params.yaml,
+                        for class_weight strategy the data is returned as it is and the models are weighted instead
+
+        Output      :   The features and labels after resampling
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.handleImbalance.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
         try:
-            sample = SMOTE()
+            self.log_writer.log(
+                f"Handling imbalance with {self.imbalance_strategy} strategy on {X.shape[0]} rows",
+                **log_dic,
+            )
+
+            if self.imbalance_strategy == "smote":
+                from imblearn.over_sampling import SMOTE
+
+                sample = SMOTE(
+                    random_state=self.random_state, **self.imbalance_config["smote"]
+                )
+
+            elif self.imbalance_strategy == "undersample":
+                from imblearn.under_sampling import RandomUnderSampler
+
+                sample = RandomUnderSampler(
+                    random_state=self.random_state,
+                    **self.imbalance_config["undersample"],
+                )
+
+            elif self.imbalance_strategy == "class_weight":
+                self.log_writer.log(
+                    "Skipped resampling, class weights will be passed to the models",
+                    **log_dic,
+                )
+
+                self.log_writer.start_log("exit", **log_dic)
+
+                return X, Y
+
+            else:
+                raise ValueError(
+                    f"{self.imbalance_strategy} is not a valid imbalance strategy"
+                )
+
+            start_time = perf_counter()
 
             X_bal, y_bal = sample.fit_resample(X, Y)
 
+            resample_time = perf_counter() - start_time
+
+            self.log_writer.log(
+                f"Resampled data using {sample.__class__.__name__} in {resample_time:.2f} seconds, "
+                f"rows changed from {X.shape[0]} to {X_bal.shape[0]} with class counts as {dict(y_bal.value_counts())}",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
             return X_bal, y_bal
 
         except Exception as e:
-            raise e
+            self.log_writer.exception_log(e, **log_dic)
@@ -1,12 +1,26 @@
 import os
+import pickle
+import threading
+from hashlib import sha256
+from tempfile import TemporaryDirectory
+from time import time
 
+import cloudpickle
 import mlflow
+import mlflow.sklearn
+from mlflow.entities import Metric, Param, RunTag
+from mlflow.models import Model
 from mlflow.tracking import MlflowClient
+from sklearn.dummy import DummyClassifier
 
 from air_pressure.s3_bucket_operations.s3_operations import S3_Operation
 from utils.logger import App_Logger
 from utils.read_params import get_log_dic, read_params
 
+_mlflow_clients_lock = threading.Lock()
+
+_mlflow_clients = {}
+
 
 class MLFlow_Operation:
     """
@@ -35,6 +49,8 @@ class MLFlow_Operation:
 
         self.model_save_format = self.config["save_format"]
 
+        self.tree_engine_format = self.config["tree_engine"]["save_format"]
+
     def get_experiment_from_mlflow(self, exp_name):
         """
         Method Name :   get_experiment_from_mlflow
@@ -140,7 +156,8 @@ class MLFlow_Operation:
     def get_mlflow_client(self, server_uri):
         """
         Method Name :   get_mlflow_client
-        Description :   This method gets mlflow client for the particular server uri
+        Description :   This method gets mlflow client for the particular server uri, the client is created once
+                        per server uri and reused by the later calls in the process
 
         Output      :   A mlflow client is created with particular server uri
         On Failure  :   Write an exception log and then raise an exception
@@ -159,7 +176,11 @@ class MLFlow_Operation:
         self.log_writer.start_log("start", **log_dic)
 
         try:
-            client = MlflowClient(tracking_uri=server_uri)
+            with _mlflow_clients_lock:
+                if server_uri not in _mlflow_clients:
+                    _mlflow_clients[server_uri] = MlflowClient(tracking_uri=server_uri)
+
+                client = _mlflow_clients[server_uri]
 
             self.log_writer.log("Got mlflow client with tracking uri", **log_dic)
 
@@ -279,6 +300,103 @@ class MLFlow_Operation:
         except Exception as e:
             self.log_writer.exception_log(e, **log_dic)
 
+    def get_latest_model_versions(self, model_name, stages):
+        """
+        Method Name :   get_latest_model_versions
+        Description :   This method gets the latest versions of a registered model in the mentioned stages, so that
+                        only the registered model which is needed is queried instead of the whole registry
+
+        Output      :   A list of model versions of the registered model
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.get_latest_model_versions.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            remote_server_uri = os.environ["MLFLOW_TRACKING_URI"]
+
+            client = self.get_mlflow_client(server_uri=remote_server_uri)
+
+            model_versions = client.get_latest_versions(model_name, stages=stages)
+
+            self.log_writer.log(
+                f"Got versions {[mv.version for mv in model_versions]} of {model_name} in {stages} stages",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return model_versions
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_train_model_versions(self, exp_name, train_id):
+        """
+        Method Name :   get_train_model_versions
+        Description :   This method gets the model versions registered by the runs of a training, the runs are found
+                        by their train_id tag and the versions are filtered by the run ids, so that only the models of
+                        the training are queried instead of the latest versions of each registered model
+
+        Output      :   A dict of the latest model version registered by the training for each model name is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.get_train_model_versions.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            remote_server_uri = os.environ["MLFLOW_TRACKING_URI"]
+
+            client = self.get_mlflow_client(server_uri=remote_server_uri)
+
+            exp_id = client.get_experiment_by_name(exp_name).experiment_id
+
+            runs = client.search_runs(
+                [exp_id], filter_string=f"tags.train_id = '{train_id}'"
+            )
+
+            model_versions = {}
+
+            for run in runs:
+                for mv in client.search_model_versions(f"run_id='{run.info.run_id}'"):
+                    if mv.name not in model_versions or int(mv.version) > int(
+                        model_versions[mv.name].version
+                    ):
+                        model_versions[mv.name] = mv
+
+            self.log_writer.log(
+                f"Got versions {[(mv.name, mv.version) for mv in model_versions.values()]} "
+                f"registered by {len(runs)} runs of {train_id} training",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return model_versions
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
     def log_model(self, model, model_name):
         """
         Method Name :   log_model
@@ -312,70 +430,280 @@ class MLFlow_Operation:
         except Exception as e:
             self.log_writer.exception_log(e, **log_dic)
 
-    def log_metric(self, model_name, metric):
+    def get_model_bytes(self, model):
         """
-        Method Name :   log_metric
-        Description :   This method logs the model metric to mlflow server
+        Method Name :   get_model_bytes
+        Description :   This method serializes the model once with the mlflow serialization format, the same bytes
+                        are saved to s3 bucket and logged to mlflow server
 
-        Output      :   A model metric is logged to mlflow server
+        Output      :   The serialized model bytes are returned
         On Failure  :   Write an exception log and then raise an exception
 
         Version     :   1.2
-        
+
         Revisions   :   moved setup to cloud
         """
         log_dic = get_log_dic(
-            self.__class__.__name__, self.log_metric.__name__, __file__, self.log_file
+            self.__class__.__name__,
+            self.get_model_bytes.__name__,
+            __file__,
+            self.log_file,
         )
 
         self.log_writer.start_log("start", **log_dic)
 
         try:
-            model_score_name = f"{model_name}-best_score"
+            if (
+                self.mlflow_save_format
+                == mlflow.sklearn.SERIALIZATION_FORMAT_CLOUDPICKLE
+            ):
+                model_bytes = cloudpickle.dumps(model)
 
-            mlflow.log_metric(model_score_name, value=metric)
+            else:
+                model_bytes = pickle.dumps(model)
 
-            self.log_writer.log(f"{model_score_name} logged in mlflow", **log_dic)
+            self.log_writer.log(
+                f"Serialized {model.__class__.__name__} model to {len(model_bytes)} bytes with {self.mlflow_save_format}",
+                **log_dic,
+            )
 
             self.log_writer.start_log("exit", **log_dic)
 
+            return model_bytes
+
         except Exception as e:
             self.log_writer.exception_log(e, **log_dic)
 
-    def log_param(self, idx, model, model_name, param):
+    def log_model_bytes(self, model_bytes, model_name, model_sha256, register=True):
         """
-        Method Name :   log_param
-        Description :   This method logs the model param to mlflow server
+        Method Name :   log_model_bytes
+        Description :   This method logs the serialized model bytes to mlflow server as a sklearn model, the model dir
+                        is saved by mlflow with the model bytes as pickle, so that the model is not serialized again.
+                        The model is registered unless register is False. When the active run has already registered
+                        the model bytes, they are not logged and registered again
 
-        Output      :   A model param is logged to mlflow server
+        Output      :   A model is logged and registered in mlflow server
         On Failure  :   Write an exception log and then raise an exception
 
         Version     :   1.2
-        
+
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.log_model_bytes.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            run_id = mlflow.active_run().info.run_id
+
+            registered_version = self.get_registered_version(model_name, model_sha256)
+
+            if registered_version is not None:
+                self.log_writer.log(
+                    f"{model_name} model bytes are already registered in mlflow with version as "
+                    f"{registered_version}, skipped logging them",
+                    **log_dic,
+                )
+
+                self.log_writer.start_log("exit", **log_dic)
+
+                return
+
+            include_cloudpickle = (
+                self.mlflow_save_format
+                == mlflow.sklearn.SERIALIZATION_FORMAT_CLOUDPICKLE
+            )
+
+            with TemporaryDirectory() as tmp_dir:
+                model_dir = os.path.join(tmp_dir, model_name)
+
+                mlflow_model = Model(artifact_path=model_name, run_id=run_id)
+
+                # mlflow saves the model dir as log_model would, with MLmodel, conda.yaml, python_env.yaml and
+                # requirements.txt of the mlflow 1.28 sklearn flavor, an unfitted placeholder is saved so that
+                # the model is not serialized again and its pickle is then replaced by the model bytes
+                mlflow.sklearn.save_model(
+                    sk_model=DummyClassifier(),
+                    path=model_dir,
+                    mlflow_model=mlflow_model,
+                    serialization_format=self.mlflow_save_format,
+                    pip_requirements=mlflow.sklearn.get_default_pip_requirements(
+                        include_cloudpickle
+                    ),
+                )
+
+                with open(os.path.join(model_dir, "model.pkl"), "wb") as f:
+                    f.write(model_bytes)
+
+                mlflow.log_artifacts(model_dir, artifact_path=model_name)
+
+                mlflow.tracking.fluent._record_logged_model(mlflow_model)
+
+            self.log_writer.log(f"Logged {model_name} model bytes in mlflow", **log_dic)
+
+            if register:
+                self.register_logged_model(model_name, model_sha256)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_registered_version(self, model_name, model_sha256):
+        """
+        Method Name :   get_registered_version
+        Description :   This method gets the version of the model which the active run has registered with the sha256
+                        tag of the model bytes, the versions are filtered by the run id of the active run
+
+        Output      :   The registered model version is returned, None if the model bytes are not registered
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+
         Revisions   :   moved setup to cloud
         """
         log_dic = get_log_dic(
-            self.__class__.__name__, self.log_param.__name__, __file__, self.log_file
+            self.__class__.__name__,
+            self.get_registered_version.__name__,
+            __file__,
+            self.log_file,
         )
 
         self.log_writer.start_log("start", **log_dic)
 
         try:
-            model_param_name = model_name + str(idx) + f"-{param}"
+            run_id = mlflow.active_run().info.run_id
 
-            mlflow.log_param(model_param_name, value=model.__dict__[param])
+            client = self.get_mlflow_client(server_uri=mlflow.get_tracking_uri())
 
-            self.log_writer.log(f"{model_param_name} logged in mlflow", **log_dic)
+            registered_version = None
+
+            for mv in client.search_model_versions(f"run_id='{run_id}'"):
+                if (
+                    mv.name == model_name
+                    and mv.tags.get(f"{model_name}-sha256") == model_sha256
+                ):
+                    registered_version = mv.version
+
+                    break
 
             self.log_writer.start_log("exit", **log_dic)
 
+            return registered_version
+
         except Exception as e:
             self.log_writer.exception_log(e, **log_dic)
 
-    def log_all_for_model(self, model, model_score, idx=None):
+    def register_logged_model(self, model_name, model_sha256):
+        """
+        Method Name :   register_logged_model
+        Description :   This method registers the model logged under model_name in the active run as a new version
+                        of the registered model, the version is tagged with the sha256 of the model bytes. When the
+                        active run has already registered the model bytes, that version is returned instead
+
+        Output      :   The registered model version is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.register_logged_model.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            run_id = mlflow.active_run().info.run_id
+
+            registered_version = self.get_registered_version(model_name, model_sha256)
+
+            if registered_version is not None:
+                self.log_writer.log(
+                    f"{model_name} model is already registered in mlflow with version as {registered_version}",
+                    **log_dic,
+                )
+
+                self.log_writer.start_log("exit", **log_dic)
+
+                return registered_version
+
+            model_version = mlflow.register_model(
+                f"runs:/{run_id}/{model_name}", model_name
+            )
+
+            client = self.get_mlflow_client(server_uri=mlflow.get_tracking_uri())
+
+            client.set_model_version_tag(
+                model_name, model_version.version, f"{model_name}-sha256", model_sha256
+            )
+
+            self.log_writer.log(
+                f"Registered {model_name} model in mlflow with version as {model_version.version}",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return model_version.version
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def log_batch(self, params, metrics, tags=None):
+        """
+        Method Name :   log_batch
+        Description :   This method logs the params, metrics and tags of the active run to mlflow server in a single
+                        log_batch request
+
+        Output      :   Params, metrics and tags are logged to mlflow server
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.log_batch.__name__, __file__, self.log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            run_id = mlflow.active_run().info.run_id
+
+            client = self.get_mlflow_client(server_uri=mlflow.get_tracking_uri())
+
+            client.log_batch(run_id, metrics=metrics, params=params, tags=tags or [])
+
+            self.log_writer.log(
+                f"Logged {len(params)} params and {len(metrics)} metrics in mlflow for {run_id} run",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def log_all_for_model(
+        self, model, model_score, idx=None, model_bytes=None, register=True
+    ):
         """
         Method Name :   log_all_for_model
-        Description :   This method logs model,model params and model score to mlflow server
+        Description :   This method logs model,model params and model score to mlflow server, the params and score
+                        are logged in one batch. When the serialized model bytes are given, they are logged as they
+                        are and their sha256 is logged as a tag, the model bytes are registered unless register is
+                        False
 
         Output      :   Model,model parameters and model score are logged to mlflow server
         On Failure  :   Write an exception log and then raise an exception
@@ -406,12 +734,98 @@ class MLFlow_Operation:
                 f"Created a list of params based on {base_model_name}", **log_dic
             )
 
-            for param in model_params_list:
-                self.log_param(idx, model, base_model_name, param=param)
+            params = [
+                Param(
+                    base_model_name + str(idx) + f"-{param}", str(model.__dict__[param])
+                )
+                for param in model_params_list
+            ]
+
+            metrics = [
+                Metric(
+                    f"{base_model_name}-best_score",
+                    float(model_score),
+                    int(time() * 1000),
+                    0,
+                )
+            ]
+
+            if model_bytes is None:
+                self.log_batch(params, metrics)
+
+                self.log_model(model, base_model_name)
+
+            else:
+                model_sha256 = sha256(model_bytes).hexdigest()
+
+                tags = [RunTag(f"{base_model_name}-sha256", model_sha256)]
+
+                self.log_batch(params, metrics, tags=tags)
+
+                self.log_model_bytes(
+                    model_bytes, base_model_name, model_sha256, register=register
+                )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def copy_tree_engine(
+        self, model_name, to_model_dir, from_bucket, to_bucket, from_model_dir=None
+    ):
+        """
+        Method Name :   copy_tree_engine
+        Description :   This method copies the tree ensemble engine of the model from from_model_dir, the trained
+                        model dir by default, to the model dir, along with the model. When the trained model has no
+                        engine, the engine of an earlier model in the model dir is deleted
+
+        Output      :   The tree ensemble engine in the model dir is the engine of the trained model
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.copy_tree_engine.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            trained_engine_file = (
+                (from_model_dir or self.trained_models_dir)
+                + "/"
+                + model_name
+                + self.tree_engine_format
+            )
+
+            engine_file = to_model_dir + "/" + model_name + self.tree_engine_format
+
+            if (
+                self.s3.get_object_metadata(
+                    trained_engine_file, from_bucket, self.log_file
+                )
+                is None
+            ):
+                self.s3.delete_file(engine_file, to_bucket, self.log_file)
 
-            self.log_model(model, base_model_name)
+            else:
+                self.s3.copy_data(
+                    trained_engine_file,
+                    from_bucket,
+                    engine_file,
+                    to_bucket,
+                    self.log_file,
+                )
 
-            self.log_metric(base_model_name, metric=float(model_score))
+            self.log_writer.log(
+                f"Updated tree ensemble engine of {model_name} in {to_model_dir} dir",
+                **log_dic,
+            )
 
             self.log_writer.start_log("exit", **log_dic)
 
@@ -419,11 +833,22 @@ class MLFlow_Operation:
             self.log_writer.exception_log(e, **log_dic)
 
     def transition_mlflow_model(
-        self, model_version, stage, model_name, from_bucket, to_bucket
+        self,
+        model_version,
+        stage,
+        model_name,
+        from_bucket,
+        to_bucket,
+        archive_existing_versions=False,
+        from_model_dir=None,
     ):
         """
         Method Name :   transition_mlflow_model
-        Description :   This method transitions mlflow model from one stage to other stage, and does the same in s3 bucket
+        Description :   This method transitions mlflow model from one stage to other stage, and does the same in s3 bucket.
+                        The model files are copied from from_model_dir, the trained model dir by default.
+                        When archive_existing_versions is set, other versions in the stage are archived by mlflow. When
+                        a version is archived, the model and tree ensemble engine files of the model are deleted from
+                        prod models dir, so that the production model cache does not load them
 
         Output      :   A mlflow model is transitioned from one stage to another, and same is reflected in s3 bucket
         On Failure  :   Write an exception log and then raise an exception
@@ -453,7 +878,10 @@ class MLFlow_Operation:
             client = self.get_mlflow_client(server_uri=remote_server_uri)
 
             trained_model_file = (
-                self.trained_models_dir + "/" + model_name + self.model_save_format
+                (from_model_dir or self.trained_models_dir)
+                + "/"
+                + model_name
+                + self.model_save_format
             )
 
             stag_model_file = (
@@ -470,7 +898,10 @@ class MLFlow_Operation:
                 self.log_writer.log(f"{stage} is selected for transition", **log_dic)
 
                 client.transition_model_version_stage(
-                    name=model_name, version=current_version, stage=stage
+                    name=model_name,
+                    version=current_version,
+                    stage=stage,
+                    archive_existing_versions=archive_existing_versions,
                 )
 
                 self.log_writer.log(
@@ -485,11 +916,22 @@ class MLFlow_Operation:
                     self.log_file,
                 )
 
+                self.copy_tree_engine(
+                    model_name,
+                    self.prod_models_dir,
+                    from_bucket,
+                    to_bucket,
+                    from_model_dir=from_model_dir,
+                )
+
             elif stage == "Staging":
                 self.log_writer.log(f"{stage} is selected for transition", **log_dic)
 
                 client.transition_model_version_stage(
-                    name=model_name, version=current_version, stage=stage
+                    name=model_name,
+                    version=current_version,
+                    stage=stage,
+                    archive_existing_versions=archive_existing_versions,
                 )
 
                 self.log_writer.log(
@@ -504,6 +946,38 @@ class MLFlow_Operation:
                     self.log_file,
                 )
 
+                self.copy_tree_engine(
+                    model_name,
+                    self.staged_models_dir,
+                    from_bucket,
+                    to_bucket,
+                    from_model_dir=from_model_dir,
+                )
+
+            elif stage == "Archived":
+                self.log_writer.log(f"{stage} is selected for transition", **log_dic)
+
+                client.transition_model_version_stage(
+                    name=model_name, version=current_version, stage=stage,
+                )
+
+                self.log_writer.log(
+                    f"Transitioned {model_name} to {stage} in mlflow", **log_dic
+                )
+
+                self.s3.delete_file(prod_model_file, to_bucket, self.log_file)
+
+                self.s3.delete_file(
+                    self.prod_models_dir + "/" + model_name + self.tree_engine_format,
+                    to_bucket,
+                    self.log_file,
+                )
+
+                self.log_writer.log(
+                    f"Deleted {model_name} model and its tree ensemble engine from {self.prod_models_dir} dir",
+                    **log_dic,
+                )
+
             else:
                 self.log_writer.log(
                     "Please select stage for model transition", **log_dic
@@ -0,0 +1,436 @@
+import fcntl
+import json
+import os
+import pickle
+import shutil
+import threading
+from hashlib import sha256
+from logging import ERROR
+from time import sleep, time_ns
+from uuid import uuid4
+
+from utils.logger import App_Logger
+from utils.read_params import get_log_dic, read_params
+
+_worker_lock = threading.Lock()
+
+_worker_thread = None
+
+
+def _reset_after_fork():
+    global _worker_lock, _worker_thread
+
+    _worker_lock = threading.Lock()
+
+    _worker_thread = None
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+class MLFlow_Spool:
+    """
+    Description :   This class shall be used for logging to mlflow in the background, the mlflow jobs are written to
+                    a local spool dir and a background worker drains them in order. A failed job is retried with
+                    backoff and is only removed from the spool after it succeeds, so no run data is lost when
+                    the tracking server is slow or unavailable. A job which fails max_attempts times is moved to
+                    the dead letter dir, so that it does not block the jobs after it
+    Version     :   1.2
+    Revisions   :   moved setup to cloud
+    """
+
+    def __init__(self):
+        self.config = read_params()
+
+        self.spool_config = self.config["mlflow_config"]["spool"]
+
+        self.enabled = self.spool_config["enabled"]
+
+        self.spool_dir = self.spool_config["dir"]
+
+        self.poll_interval = self.spool_config["poll_interval"]
+
+        self.backoff = self.spool_config["backoff"]
+
+        self.max_backoff = self.spool_config["max_backoff"]
+
+        self.max_attempts = self.spool_config["max_attempts"]
+
+        self.dead_letter_dir = self.spool_config["dead_letter_dir"]
+
+        self.exp_name = self.config["mlflow_config"]["experiment_name"]
+
+        self.run_name = self.config["mlflow_config"]["run_name"]
+
+        self.spool_log = self.config["log"]["mlflow_spool"]
+
+        self.mlflow_op = None
+
+        self.log_writer = App_Logger()
+
+    def put_job(self, kind, payload, log_file, model_bytes=None):
+        """
+        Method Name :   put_job
+        Description :   This method writes a job to the spool dir, the job dir is written under a temp name and then
+                        renamed, so that the worker never sees a partial job. The background worker is started if
+                        it is not running
+
+        Output      :   A job is written to the spool dir
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.put_job.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            os.makedirs(self.spool_dir, exist_ok=True)
+
+            job_name = f"{time_ns():020d}_{uuid4().hex[:8]}_{kind}"
+
+            tmp_job_dir = os.path.join(self.spool_dir, "." + job_name)
+
+            os.makedirs(tmp_job_dir)
+
+            if model_bytes is not None:
+                with open(os.path.join(tmp_job_dir, "model.pkl"), "wb") as f:
+                    f.write(model_bytes)
+
+            with open(os.path.join(tmp_job_dir, "job.json"), "w") as f:
+                json.dump({"kind": kind, "payload": payload, "attempts": 0}, f)
+
+            os.rename(tmp_job_dir, os.path.join(self.spool_dir, job_name))
+
+            self.log_writer.log(f"Put {job_name} job in mlflow spool", **log_dic)
+
+            self.start_worker(log_file)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_jobs(self):
+        """
+        Method Name :   get_jobs
+        Description :   This method gets the job dirs in the spool dir in the order in which they were put
+
+        Output      :   A list of job dirs is returned
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        if os.path.isdir(self.spool_dir) is False:
+            return []
+
+        return [
+            os.path.join(self.spool_dir, job_name)
+            for job_name in sorted(os.listdir(self.spool_dir))
+            if job_name.startswith(".") is False
+        ]
+
+    def update_job(self, job_dir, job):
+        """
+        Method Name :   update_job
+        Description :   This method atomically rewrites job.json of the job dir
+
+        Output      :   job.json of the job dir is updated
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        job_file = os.path.join(job_dir, "job.json")
+
+        with open(job_file + ".tmp", "w") as f:
+            json.dump(job, f)
+
+        os.replace(job_file + ".tmp", job_file)
+
+    def run_job(self, job_dir, log_file):
+        """
+        Method Name :   run_job
+        Description :   This method runs a job from the spool. A log_model job logs the model with its params and
+                        score in its own mlflow run. The run id, the logging of the model and the registered version
+                        are saved to the job as each step is done, so that a retry resumes the same run and skips the
+                        steps which are done, and the model is not registered twice. A promote job transitions the
+                        registered models once the log_model jobs before it are done, from the snapshot of the
+                        trained files which was taken when the job was put, and then deletes the snapshot
+
+        Output      :   The job is run against the mlflow server
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.run_job.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            with open(os.path.join(job_dir, "job.json")) as f:
+                job = json.load(f)
+
+            if job["kind"] == "log_model":
+                with open(os.path.join(job_dir, "model.pkl"), "rb") as f:
+                    model_bytes = f.read()
+
+                model = pickle.loads(model_bytes)
+
+                import mlflow
+
+                from air_pressure.mlflow_utils.mlflow_operations import MLFlow_Operation
+
+                if self.mlflow_op is None:
+                    self.mlflow_op = MLFlow_Operation(self.spool_log)
+
+                self.mlflow_op.set_mlflow_tracking_uri()
+
+                self.mlflow_op.set_mlflow_experiment(self.exp_name)
+
+                run_kwargs = (
+                    {
+                        "run_name": self.run_name,
+                        "tags": {"train_id": job["payload"]["train_id"]},
+                    }
+                    if job.get("run_id") is None
+                    else {"run_id": job["run_id"]}
+                )
+
+                with mlflow.start_run(**run_kwargs) as run:
+                    if job.get("run_id") is None:
+                        job["run_id"] = run.info.run_id
+
+                        self.update_job(job_dir, job)
+
+                    if job.get("logged") is not True:
+                        self.mlflow_op.log_all_for_model(
+                            model,
+                            job["payload"]["model_score"],
+                            model_bytes=model_bytes,
+                            register=False,
+                        )
+
+                        job["logged"] = True
+
+                        self.update_job(job_dir, job)
+
+                    if job.get("registered_version") is None:
+                        registered_version = self.mlflow_op.register_logged_model(
+                            model.__class__.__name__, sha256(model_bytes).hexdigest()
+                        )
+
+                        job["registered_version"] = registered_version
+
+                        self.update_job(job_dir, job)
+
+            elif job["kind"] == "promote":
+                from air_pressure.model.load_production_model import Load_Prod_Model
+
+                load_prod_model = Load_Prod_Model()
+
+                snapshot_dir = job["payload"].get("snapshot_dir")
+
+                if job.get("promoted") is not True:
+                    load_prod_model.load_production_model(
+                        job["payload"]["model_score_lst"],
+                        job["payload"]["train_id"],
+                        from_model_dir=snapshot_dir,
+                    )
+
+                    job["promoted"] = True
+
+                    self.update_job(job_dir, job)
+
+                if snapshot_dir is not None:
+                    load_prod_model.delete_snapshot(snapshot_dir)
+
+            else:
+                raise Exception(f"{job['kind']} is not a valid mlflow spool job")
+
+            self.log_writer.log(
+                f"Ran {os.path.basename(job_dir)} job from mlflow spool", **log_dic
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def drain(self, log_file):
+        """
+        Method Name :   drain
+        Description :   This method is run by the background worker, it runs the jobs in order and removes each job
+                        after it succeeds. A failed job stays at the head of the spool and is retried with exponential
+                        backoff capped at max_backoff, so that the jobs after it keep their order. After max_attempts
+                        failed attempts, the job is moved to the dead letter dir with an error log. An error of the loop
+                        itself is logged and the loop goes on, so the worker never dies. The worker holds a lock on
+                        the spool dir, so that only one process on the host drains the spool
+
+        Output      :   The spool is drained for as long as the process runs
+        On Failure  :   Write a log and retry the job, or move it to the dead letter dir
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.drain.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        os.makedirs(self.spool_dir, exist_ok=True)
+
+        lock_f = open(os.path.join(self.spool_dir, ".lock"), "w")
+
+        fcntl.flock(lock_f, fcntl.LOCK_EX)
+
+        self.log_writer.log(f"Got lock on {self.spool_dir} dir", **log_dic)
+
+        while True:
+            try:
+                jobs = self.get_jobs()
+
+                if len(jobs) == 0:
+                    sleep(self.poll_interval)
+
+                    continue
+
+                job_dir = jobs[0]
+
+                try:
+                    self.run_job(job_dir, log_file)
+
+                    shutil.rmtree(job_dir)
+
+                except Exception as e:
+                    self.fail_job(job_dir, e, log_dic)
+
+            except Exception as e:
+                self.log_writer.log(
+                    f"Draining mlflow spool failed with {e}, retrying in {self.poll_interval} seconds",
+                    **log_dic,
+                    level=ERROR,
+                )
+
+                sleep(self.poll_interval)
+
+    def fail_job(self, job_dir, error, log_dic):
+        """
+        Method Name :   fail_job
+        Description :   This method counts a failed attempt of the job in its job.json and waits with backoff before
+                        the job is retried. A job which failed max_attempts times, or whose job.json can not be read,
+                        is moved to the dead letter dir
+
+        Output      :   The failed attempt of the job is recorded
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        try:
+            with open(os.path.join(job_dir, "job.json")) as f:
+                job = json.load(f)
+
+        except Exception as e:
+            self.dead_letter_job(
+                job_dir,
+                f"failed with {error} and its job.json can not be read, {e}",
+                log_dic,
+            )
+
+            return
+
+        job["attempts"] += 1
+
+        self.update_job(job_dir, job)
+
+        if job["attempts"] >= self.max_attempts:
+            self.dead_letter_job(
+                job_dir, f"failed {job['attempts']} times with {error}", log_dic
+            )
+
+            return
+
+        retry_in = min(self.backoff ** job["attempts"], self.max_backoff)
+
+        self.log_writer.log(
+            f"Attempt {job['attempts']} of {os.path.basename(job_dir)} job failed with {error}, "
+            f"retrying in {retry_in} seconds",
+            **log_dic,
+        )
+
+        sleep(retry_in)
+
+    def dead_letter_job(self, job_dir, reason, log_dic):
+        """
+        Method Name :   dead_letter_job
+        Description :   This method moves the job dir to the dead letter dir and writes an error log, so that the
+                        job does not block the jobs after it
+
+        Output      :   The job is moved to the dead letter dir
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        os.makedirs(self.dead_letter_dir, exist_ok=True)
+
+        shutil.move(
+            job_dir, os.path.join(self.dead_letter_dir, os.path.basename(job_dir))
+        )
+
+        self.log_writer.log(
+            f"{os.path.basename(job_dir)} job {reason}, moved it to {self.dead_letter_dir} dir",
+            **log_dic,
+            level=ERROR,
+        )
+
+    def start_worker(self, log_file):
+        """
+        Method Name :   start_worker
+        Description :   This method starts the background worker thread which drains the spool, only one worker is
+                        run per process
+
+        Output      :   The background worker is running
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        global _worker_thread
+
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.start_worker.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            with _worker_lock:
+                if _worker_thread is None or _worker_thread.is_alive() is False:
+                    _worker_thread = threading.Thread(
+                        target=self.drain,
+                        args=(self.spool_log,),
+                        name="mlflow-spool",
+                        daemon=True,
+                    )
+
+                    _worker_thread.start()
+
+                    self.log_writer.log(
+                        f"Started mlflow spool worker with {len(self.get_jobs())} pending jobs",
+                        **log_dic,
+                    )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
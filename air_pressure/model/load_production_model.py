@@ -1,3 +1,5 @@
+from concurrent.futures import ThreadPoolExecutor
+
 from air_pressure.mlflow_utils.mlflow_operations import MLFlow_Operation
 from air_pressure.s3_bucket_operations.s3_operations import S3_Operation
 from utils.logger import App_Logger
@@ -21,15 +23,133 @@ class Load_Prod_Model:
 
         self.load_prod_model_log = self.config["log"]["load_prod_model"]
 
+        self.preprocessing_pipeline_file = (
+            self.config["preprocessing_pipeline"] + self.config["save_format"]
+        )
+
+        self.train_model_dir = self.config["model_dir"]["trained"]
+
+        self.snapshot_model_dir = self.config["model_dir"]["snapshot"]
+
+        self.tree_engine_format = self.config["tree_engine"]["save_format"]
+
+        self.prod_model_dir = self.config["model_dir"]["prod"]
+
+        self.exp_name = self.config["mlflow_config"]["experiment_name"]
+
         self.s3 = S3_Operation()
 
         self.mlflow_op = MLFlow_Operation(self.load_prod_model_log)
 
-    def load_production_model(self, model_lst):
+    def snapshot_trained_models(self, model_lst, train_id):
+        """
+        Method Name :   snapshot_trained_models
+        Description :   This method copies the trained models, their tree ensemble engines and the preprocessing
+                        pipeline of the training to a snapshot dir of the train id, so that a promotion which runs
+                        later publishes the files of its own training, even when another training has replaced the
+                        files in the trained models dir
+
+        Output      :   The snapshot dir of the training is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.snapshot_trained_models.__name__,
+            __file__,
+            self.load_prod_model_log,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            snapshot_dir = self.snapshot_model_dir + "/" + train_id
+
+            fnames = [self.preprocessing_pipeline_file]
+
+            for _, model_name in model_lst:
+                fnames.append(model_name + self.config["save_format"])
+
+                engine_fname = model_name + self.tree_engine_format
+
+                if (
+                    self.s3.get_object_metadata(
+                        self.train_model_dir + "/" + engine_fname,
+                        self.model_bucket,
+                        self.load_prod_model_log,
+                    )
+                    is not None
+                ):
+                    fnames.append(engine_fname)
+
+            for fname in fnames:
+                self.s3.copy_data(
+                    self.train_model_dir + "/" + fname,
+                    self.model_bucket,
+                    snapshot_dir + "/" + fname,
+                    self.model_bucket,
+                    self.load_prod_model_log,
+                )
+
+            self.log_writer.log(
+                f"Copied {fnames} of {train_id} training to {snapshot_dir} dir",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return snapshot_dir
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def delete_snapshot(self, snapshot_dir):
+        """
+        Method Name :   delete_snapshot
+        Description :   This method deletes the files in the snapshot dir of a training after it is promoted
+
+        Output      :   The snapshot dir is deleted from s3 bucket
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.delete_snapshot.__name__,
+            __file__,
+            self.load_prod_model_log,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            fnames = self.s3.get_object_etags(
+                snapshot_dir + "/", self.model_bucket, self.load_prod_model_log
+            )
+
+            for fname in fnames:
+                self.s3.delete_file(fname, self.model_bucket, self.load_prod_model_log)
+
+            self.log_writer.log(
+                f"Deleted {len(fnames)} files of {snapshot_dir} dir", **log_dic
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def load_production_model(self, model_lst, train_id, from_model_dir=None):
         """
         Method Name :   load_production_model
-        Description :   This method is responsible for moving the models from the trained models dir to
-                        prod models dir and stag models dir based on the metrics of the cluster
+        Description :   This method is responsible for moving the models from from_model_dir, the trained models dir
+                        by default, to prod models dir and stag models dir based on the metrics of the cluster. Only
+                        the model versions registered by the runs of the training are queried from the registry and
+                        they are transitioned concurrently. The preprocessing pipeline of the run is copied to prod
+                        models dir with the models
 
         Version     :   1.2
         Revisions   :   moved setup to cloud
@@ -44,36 +164,135 @@ class Load_Prod_Model:
         self.log_writer.start_log("start", **log_dic)
 
         try:
-            top_mn_lst = max(model_lst, key=lambda item: item[0])[1]
-
-            self.log_writer.log("Got the top model names", **log_dic)
-
-            results = self.mlflow_op.search_mlflow_models(order="DESC")
-
-            for res in results:
-                for mv in res.latest_versions:
-                    if mv.name in top_mn_lst:
-                        self.mlflow_op.transition_mlflow_model(
-                            mv.version,
-                            "Production",
-                            mv.name,
-                            self.model_bucket,
-                            self.model_bucket,
-                        )
-
-                    else:
-                        self.mlflow_op.transition_mlflow_model(
-                            mv.version,
-                            "Staging",
-                            mv.name,
-                            self.model_bucket,
-                            self.model_bucket,
-                        )
+            top_model_name = max(model_lst, key=lambda item: item[0])[1]
+
+            self.log_writer.log(f"Got {top_model_name} as the top model", **log_dic)
+
+            model_versions = self.mlflow_op.get_train_model_versions(
+                self.exp_name, train_id
+            )
+
+            model_names = [model_name for _, model_name in model_lst]
+
+            missing_model_names = [
+                model_name
+                for model_name in model_names
+                if model_name not in model_versions
+            ]
+
+            if top_model_name in missing_model_names:
+                raise Exception(
+                    f"{top_model_name} model is not registered by {train_id} training"
+                )
+
+            if len(missing_model_names) > 0:
+                self.log_writer.log(
+                    f"{missing_model_names} models are not registered by {train_id} training, "
+                    "they are not transitioned",
+                    **log_dic,
+                )
+
+            with ThreadPoolExecutor(max_workers=len(model_names)) as executor:
+                list(
+                    executor.map(
+                        lambda model_name: self.transition_model(
+                            model_versions[model_name],
+                            "Production" if model_name == top_model_name else "Staging",
+                            from_model_dir,
+                        ),
+                        [
+                            model_name
+                            for model_name in model_names
+                            if model_name in model_versions
+                        ],
+                    )
+                )
 
             self.log_writer.log(
                 "Transitioning of models based on scores successfully done", **log_dic
             )
 
+            self.s3.copy_data(
+                (from_model_dir or self.train_model_dir)
+                + "/"
+                + self.preprocessing_pipeline_file,
+                self.model_bucket,
+                self.prod_model_dir + "/" + self.preprocessing_pipeline_file,
+                self.model_bucket,
+                self.load_prod_model_log,
+            )
+
+            self.log_writer.log(
+                "Copied preprocessing pipeline of the trained models to prod models dir",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def transition_model(self, model_version, stage, from_model_dir=None):
+        """
+        Method Name :   transition_model
+        Description :   This method transitions the model version registered by the training to the stage, and
+                        archives the other versions in that stage. The versions of a staged model which are still
+                        in production from an earlier training are archived and their files are deleted from prod
+                        models dir, so that only the top model of the training is in production
+
+        Output      :   The model versions are transitioned in mlflow and s3 bucket
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.transition_model.__name__,
+            __file__,
+            self.load_prod_model_log,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            model_name = model_version.name
+
+            self.mlflow_op.transition_mlflow_model(
+                model_version.version,
+                stage,
+                model_name,
+                self.model_bucket,
+                self.model_bucket,
+                archive_existing_versions=True,
+                from_model_dir=from_model_dir,
+            )
+
+            self.log_writer.log(
+                f"Transitioned version {model_version.version} of {model_name} to {stage}",
+                **log_dic,
+            )
+
+            if stage == "Staging":
+                prod_model_versions = self.mlflow_op.get_latest_model_versions(
+                    model_name, ["Production"]
+                )
+
+                for mv in prod_model_versions:
+                    self.mlflow_op.transition_mlflow_model(
+                        mv.version,
+                        "Archived",
+                        model_name,
+                        self.model_bucket,
+                        self.model_bucket,
+                    )
+
+                self.log_writer.log(
+                    f"Archived versions {[mv.version for mv in prod_model_versions]} of {model_name} "
+                    "from an earlier training in production",
+                    **log_dic,
+                )
+
             self.log_writer.start_log("exit", **log_dic)
 
         except Exception as e:
@@ -0,0 +1,306 @@
+import asyncio
+import threading
+from collections import deque
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+
+from utils.logger import App_Logger
+from utils.read_params import get_log_dic, read_params
+
+
+class Micro_Batcher:
+    """
+    Description :   This class shall be used for batching the concurrent online prediction requests, the validated
+                    records of requests which arrive within max_wait_ms are predicted together with one transform and
+                    predict call, up to max_rows rows, and the predictions are scattered back to the requests
+    Version     :   1.2
+    Revisions   :   moved setup to cloud
+    """
+
+    def __init__(self, online_prediction):
+        self.config = read_params()
+
+        self.batching_config = self.config["online_prediction"]["batching"]
+
+        self.enabled = self.batching_config["enabled"]
+
+        self.max_wait = self.batching_config["max_wait_ms"] / 1000
+
+        self.max_rows = self.batching_config["max_rows"]
+
+        self.pred_online_log = self.config["log"]["pred_online"]
+
+        self.online_prediction = online_prediction
+
+        self.batch_rows = deque(maxlen=self.batching_config["stats_window"])
+
+        self.batch_requests = deque(maxlen=self.batching_config["stats_window"])
+
+        self.queue_waits = deque(maxlen=self.batching_config["stats_window"])
+
+        self.n_batches = 0
+
+        self.stats_lock = threading.Lock()
+
+        self.queue = None
+
+        self.pending_item = None
+
+        self.worker_task = None
+
+        self.log_writer = App_Logger()
+
+    async def validate(self, records):
+        """
+        Method Name :   validate
+        Description :   This method validates the records against the prediction schema in the thread pool, so that
+                        invalid records are rejected before they are queued
+
+        Output      :   A dataframe of the records with float values and nan for missing values
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        loop = asyncio.get_event_loop()
+
+        return await loop.run_in_executor(
+            None,
+            self.online_prediction.validate_records,
+            records,
+            self.pred_online_log,
+        )
+
+    async def predict(self, data):
+        """
+        Method Name :   predict
+        Description :   This method puts the validated records in the batch queue, the request waits for its slice of
+                        the batch predictions. When batching is disabled the records are predicted on their own in
+                        the thread pool
+
+        Output      :   A list of dicts with prediction and probabilities of neg and pos class for each record
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        loop = asyncio.get_event_loop()
+
+        if self.enabled is False:
+            return await loop.run_in_executor(
+                None, self.online_prediction.predict_data, data, self.pred_online_log
+            )
+
+        if self.worker_task is None or self.worker_task.done():
+            self.queue = asyncio.Queue()
+
+            self.pending_item = None
+
+            self.worker_task = loop.create_task(self.run_batches())
+
+        future = loop.create_future()
+
+        await self.queue.put((data, future, perf_counter()))
+
+        return await future
+
+    async def get_batch(self):
+        """
+        Method Name :   get_batch
+        Description :   This method waits for the first request in the queue and then collects more requests until
+                        max_wait_ms has passed since the first request or the next request would take the batch
+                        over max_rows rows, that request is held back as the first request of the next batch
+
+        Output      :   A list of queued requests is returned
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        if self.pending_item is not None:
+            batch = [self.pending_item]
+
+            self.pending_item = None
+
+        else:
+            batch = [await self.queue.get()]
+
+        n_rows = len(batch[0][0])
+
+        deadline = batch[0][2] + self.max_wait
+
+        while n_rows < self.max_rows:
+            if self.queue.empty() is False:
+                item = self.queue.get_nowait()
+
+            else:
+                timeout = deadline - perf_counter()
+
+                if timeout <= 0:
+                    break
+
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+
+                except asyncio.TimeoutError:
+                    break
+
+            if n_rows + len(item[0]) > self.max_rows:
+                self.pending_item = item
+
+                break
+
+            batch.append(item)
+
+            n_rows += len(item[0])
+
+        return batch
+
+    async def run_batches(self):
+        """
+        Method Name :   run_batches
+        Description :   This method is run as a background task, it predicts each batch in the thread pool and sets
+                        the predictions of each request. When the batch fails, the requests are predicted one by one,
+                        so that only the failing requests get the exception
+
+        Output      :   The queued requests get their predictions
+        On Failure  :   Set the exception on the failing requests of the batch
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        loop = asyncio.get_event_loop()
+
+        while True:
+            batch = await self.get_batch()
+
+            batch_start = perf_counter()
+
+            try:
+                predictions = await loop.run_in_executor(
+                    None,
+                    self.predict_batch,
+                    [data for data, _, _ in batch],
+                    [batch_start - queued_at for _, _, queued_at in batch],
+                )
+
+            except Exception as e:
+                if len(batch) == 1:
+                    if batch[0][1].done() is False:
+                        batch[0][1].set_exception(e)
+
+                    continue
+
+                for data, future, queued_at in batch:
+                    try:
+                        request_predictions = await loop.run_in_executor(
+                            None, self.predict_batch, [data], [batch_start - queued_at],
+                        )
+
+                    except Exception as request_e:
+                        if future.done() is False:
+                            future.set_exception(request_e)
+
+                        continue
+
+                    if future.done() is False:
+                        future.set_result(request_predictions)
+
+                continue
+
+            start = 0
+
+            for data, future, _ in batch:
+                if future.done() is False:
+                    future.set_result(predictions[start : start + len(data)])
+
+                start += len(data)
+
+    def predict_batch(self, data_lst, queue_waits):
+        """
+        Method Name :   predict_batch
+        Description :   This method predicts the records of all the requests in the batch with one transform and
+                        predict call, and records the batch size and queue wait stats under the stats lock, since
+                        the stats are read by the stats route on another thread
+
+        Output      :   A list of predictions for the records of all the requests in order
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.predict_batch.__name__,
+            __file__,
+            self.pred_online_log,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            data = pd.concat(data_lst, ignore_index=True)
+
+            predictions = self.online_prediction.predict_data(
+                data, self.pred_online_log
+            )
+
+            with self.stats_lock:
+                self.n_batches += 1
+
+                self.batch_rows.append(len(data))
+
+                self.batch_requests.append(len(data_lst))
+
+                self.queue_waits.extend(queue_waits)
+
+            self.log_writer.log(
+                f"Predicted batch of {len(data_lst)} requests with {len(data)} rows, "
+                f"max queue wait was {max(queue_waits) * 1000:.2f} ms",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return predictions
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_stats(self):
+        """
+        Method Name :   get_stats
+        Description :   This method gets the batch size and queue wait stats over the recent batches, the stats are
+                        copied under the stats lock and computed outside of it
+
+        Output      :   A dict of batch size and queue wait stats is returned
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        with self.stats_lock:
+            n_batches = self.n_batches
+
+            batch_rows = list(self.batch_rows)
+
+            batch_requests = list(self.batch_requests)
+
+            queue_waits = list(self.queue_waits)
+
+        if len(batch_rows) == 0:
+            return {"batches": n_batches}
+
+        queue_waits = np.array(queue_waits) * 1000
+
+        return {
+            "batches": n_batches,
+            "mean_batch_rows": float(np.mean(batch_rows)),
+            "max_batch_rows": int(np.max(batch_rows)),
+            "mean_batch_requests": float(np.mean(batch_requests)),
+            "p50_queue_wait_ms": float(np.percentile(queue_waits, 50)),
+            "p99_queue_wait_ms": float(np.percentile(queue_waits, 99)),
+            "max_queue_wait_ms": float(np.max(queue_waits)),
+        }
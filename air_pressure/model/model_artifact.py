@@ -0,0 +1,339 @@
+import json
+import mmap
+import pickle
+import struct
+from io import BytesIO
+
+import numpy as np
+
+from utils.logger import App_Logger
+from utils.read_params import get_log_dic, read_params
+
+ARTIFACT_MAGIC = b"APSART01"
+
+ARTIFACT_HEADER = struct.Struct("<8sQQ")
+
+ARRAYS_MAGIC = b"APSARR01"
+
+
+class _Artifact_Pickler(pickle.Pickler):
+    """
+    Description :   This class shall be used for pickling an object with its large numpy arrays kept out of the
+                    pickle, each array is written as a raw aligned buffer and a reference to it is pickled instead
+    Version     :   1.2
+    Revisions   :   moved setup to cloud
+    """
+
+    def __init__(self, f, buffer_f, start, alignment, min_buffer_bytes):
+        super().__init__(f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        self.buffer_f = buffer_f
+
+        self.start = start
+
+        self.alignment = alignment
+
+        self.min_buffer_bytes = min_buffer_bytes
+
+        self.buffer_pids = {}
+
+    def persistent_id(self, obj):
+        if (
+            type(obj) is not np.ndarray
+            or obj.dtype.hasobject
+            or obj.nbytes < self.min_buffer_bytes
+        ):
+            return None
+
+        if id(obj) in self.buffer_pids:
+            return self.buffer_pids[id(obj)]
+
+        order = "F" if obj.flags.f_contiguous and not obj.flags.c_contiguous else "C"
+
+        self.buffer_f.write(b"\0" * (-self.buffer_f.tell() % self.alignment))
+
+        offset = self.start + self.buffer_f.tell()
+
+        self.buffer_f.write(obj.tobytes(order=order))
+
+        self.buffer_pids[id(obj)] = ("ndarray", offset, obj.dtype, obj.shape, order)
+
+        return self.buffer_pids[id(obj)]
+
+
+class _Artifact_Unpickler(pickle.Unpickler):
+    """
+    Description :   This class shall be used for unpickling an artifact, the referenced arrays are read only views
+                    on the memory map of the artifact file
+    Version     :   1.2
+    Revisions   :   moved setup to cloud
+    """
+
+    def __init__(self, f, artifact_map):
+        super().__init__(f)
+
+        self.artifact_map = artifact_map
+
+    def persistent_load(self, pid):
+        _, offset, dtype, shape, order = pid
+
+        count = int(np.prod(shape))
+
+        return np.frombuffer(
+            self.artifact_map, dtype=dtype, count=count, offset=offset
+        ).reshape(shape, order=order)
+
+
+class Model_Artifact:
+    """
+    Description :   This class shall be used for saving and loading models in the model artifact format. The large
+                    numpy arrays of the model (tree nodes, pca components, scaler stats and the like) are stored as
+                    uncompressed buffers aligned to model_artifact.alignment bytes, followed by the pickle of the
+                    rest of the model. On load the file is memory mapped and the arrays are views on the map, so
+                    the workers on one host share the pages of the file and nothing is copied on load
+    Version     :   1.2
+    Revisions   :   moved setup to cloud
+    """
+
+    def __init__(self):
+        self.config = read_params()
+
+        self.alignment = self.config["model_artifact"]["alignment"]
+
+        self.min_buffer_bytes = self.config["model_artifact"]["min_buffer_bytes"]
+
+        self.log_writer = App_Logger()
+
+    def dump_artifact(self, obj, log_file):
+        """
+        Method Name :   dump_artifact
+        Description :   This method serializes the object in the model artifact format, the header holds the magic
+                        and the offset and length of the pickle. Arrays smaller than min_buffer_bytes and object
+                        arrays are kept in the pickle
+
+        Output      :   The bytes of the artifact are returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.dump_artifact.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            start = ARTIFACT_HEADER.size + (-ARTIFACT_HEADER.size % self.alignment)
+
+            buffer_f, pickle_f = BytesIO(), BytesIO()
+
+            pickler = _Artifact_Pickler(
+                pickle_f, buffer_f, start, self.alignment, self.min_buffer_bytes
+            )
+
+            pickler.dump(obj)
+
+            pickle_offset = start + buffer_f.tell()
+
+            pickle_bytes = pickle_f.getvalue()
+
+            header = ARTIFACT_HEADER.pack(
+                ARTIFACT_MAGIC, pickle_offset, len(pickle_bytes)
+            )
+
+            artifact_bytes = b"".join(
+                [
+                    header,
+                    b"\0" * (start - len(header)),
+                    buffer_f.getvalue(),
+                    pickle_bytes,
+                ]
+            )
+
+            self.log_writer.log(
+                f"Dumped {obj.__class__.__name__} to {len(artifact_bytes)} bytes with "
+                f"{len(pickler.buffer_pids)} buffers and {len(pickle_bytes)} bytes of pickle",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return artifact_bytes
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def load_artifact(self, artifact_file, log_file):
+        """
+        Method Name :   load_artifact
+        Description :   This method memory maps the artifact file and unpickles the object, the arrays of the object
+                        are read only views on the map. A file which is a plain pickle is unpickled as it is
+
+        Output      :   The object in the artifact file is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.load_artifact.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            with open(artifact_file, "rb") as f:
+                artifact_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+            magic, pickle_offset, pickle_len = (
+                ARTIFACT_HEADER.unpack_from(artifact_map)
+                if len(artifact_map) >= ARTIFACT_HEADER.size
+                else (None, 0, 0)
+            )
+
+            if magic == ARTIFACT_MAGIC:
+                obj = _Artifact_Unpickler(
+                    BytesIO(artifact_map[pickle_offset : pickle_offset + pickle_len]),
+                    artifact_map,
+                ).load()
+
+            else:
+                obj = pickle.loads(artifact_map[:])
+
+                artifact_map.close()
+
+            self.log_writer.log(
+                f"Loaded {obj.__class__.__name__} from {artifact_file} with memory map as {magic == ARTIFACT_MAGIC}",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return obj
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def dump_arrays(self, arrays, log_file):
+        """
+        Method Name :   dump_arrays
+        Description :   This method serializes a dict of numpy arrays and scalars without pickle, the header holds
+                        the magic, the length of a json index and the offset of the data. The index has the name,
+                        dtype, shape and offset of each array, and the arrays are written as raw aligned buffers
+                        after it. Object arrays are not allowed
+
+        Output      :   The bytes of the arrays artifact are returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.dump_arrays.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            buffer_f, index = BytesIO(), []
+
+            for name, value in arrays.items():
+                array = np.asarray(value, order="C")
+
+                if array.dtype.hasobject:
+                    raise Exception(f"{name} array has objects, it can not be dumped")
+
+                buffer_f.write(b"\0" * (-buffer_f.tell() % self.alignment))
+
+                index.append(
+                    {
+                        "name": name,
+                        "dtype": array.dtype.str,
+                        "shape": list(array.shape),
+                        "offset": buffer_f.tell(),
+                    }
+                )
+
+                buffer_f.write(array.tobytes())
+
+            index_bytes = json.dumps(index).encode()
+
+            index_end = ARTIFACT_HEADER.size + len(index_bytes)
+
+            data_offset = index_end + (-index_end % self.alignment)
+
+            header = ARTIFACT_HEADER.pack(ARRAYS_MAGIC, len(index_bytes), data_offset)
+
+            artifact_bytes = b"".join(
+                [
+                    header,
+                    index_bytes,
+                    b"\0" * (data_offset - index_end),
+                    buffer_f.getvalue(),
+                ]
+            )
+
+            self.log_writer.log(
+                f"Dumped {len(index)} arrays to {len(artifact_bytes)} bytes", **log_dic
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return artifact_bytes
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def load_arrays(self, artifact_file, log_file):
+        """
+        Method Name :   load_arrays
+        Description :   This method memory maps the arrays artifact file and reads the json index from the header,
+                        each array is a read only view on the map made with np.frombuffer, so nothing is unpickled
+
+        Output      :   A dict of the arrays in the artifact file is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.load_arrays.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            with open(artifact_file, "rb") as f:
+                artifact_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+            magic, index_len, data_offset = ARTIFACT_HEADER.unpack_from(artifact_map)
+
+            if magic != ARRAYS_MAGIC:
+                raise Exception(f"{artifact_file} is not an arrays artifact")
+
+            index = json.loads(
+                artifact_map[ARTIFACT_HEADER.size : ARTIFACT_HEADER.size + index_len]
+            )
+
+            arrays = {
+                entry["name"]: np.frombuffer(
+                    artifact_map,
+                    dtype=np.dtype(entry["dtype"]),
+                    count=int(np.prod(entry["shape"])),
+                    offset=data_offset + entry["offset"],
+                ).reshape(entry["shape"])
+                for entry in index
+            }
+
+            self.log_writer.log(
+                f"Loaded {len(arrays)} arrays from {artifact_file} with memory map",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return arrays
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
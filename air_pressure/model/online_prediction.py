@@ -0,0 +1,179 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from air_pressure.data_preprocessing.preprocessing import Preprocessor
+from air_pressure.model.prod_model_cache import Prod_Model_Cache
+from utils.logger import App_Logger
+from utils.read_params import get_log_dic, read_params
+
+
+class Online_Prediction:
+    """
+    Description :   This class shall be used for predicting on records sent as json, the records are validated against
+                    the prediction schema in memory and predicted with the cached production model, so that no s3
+                    or mongodb calls are made while serving the request
+    Version     :   1.2
+    Revisions   :   moved setup to cloud
+    """
+
+    def __init__(self):
+        self.config = read_params()
+
+        self.pred_online_log = self.config["log"]["pred_online"]
+
+        self.max_records = self.config["online_prediction"]["max_records"]
+
+        with open(self.config["schema_file"]["pred_schema_file"]) as f:
+            self.schema_cols = list(json.load(f)["ColName"])
+
+        self.schema_cols_set = set(self.schema_cols)
+
+        self.log_writer = App_Logger()
+
+        self.preprocessor = Preprocessor(self.pred_online_log)
+
+        self.prod_model_cache = Prod_Model_Cache()
+
+    def validate_records(self, records, log_file):
+        """
+        Method Name :   validate_records
+        Description :   This method validates the records against the prediction schema, each record must have all the
+                        columns of the schema and no other column. Missing values are sent as null or na, every other
+                        value must be a number
+
+        Output      :   A dataframe of the records with float values and nan for missing values
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.validate_records.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            if len(records) == 0 or len(records) > self.max_records:
+                raise Exception(
+                    f"Got {len(records)} records, expected between 1 and {self.max_records} records"
+                )
+
+            for idx, record in enumerate(records):
+                if record.keys() != self.schema_cols_set:
+                    missing_cols = sorted(self.schema_cols_set - record.keys())
+
+                    extra_cols = sorted(record.keys() - self.schema_cols_set)
+
+                    raise Exception(
+                        f"Record {idx} does not match prediction schema, missing columns are {missing_cols} "
+                        f"and unknown columns are {extra_cols}"
+                    )
+
+            data = pd.DataFrame.from_records(records, columns=self.schema_cols)
+
+            data = data.replace(["na", "'na'"], np.nan)
+
+            try:
+                data = data.astype(np.float64)
+
+            except (TypeError, ValueError) as e:
+                raise Exception(f"Records have values which are not FLOAT, {e}")
+
+            self.log_writer.log(
+                f"Validated {len(records)} records against prediction schema", **log_dic
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return data
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def predict_data(self, data, log_file):
+        """
+        Method Name :   predict_data
+        Description :   This method predicts the class labels and class probabilities of validated records with the
+                        cached production model and its preprocessing pipeline
+
+        Output      :   A list of dicts with prediction and probabilities of neg and pos class for each record
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.predict_data.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            model, preprocessing_pipeline = self.prod_model_cache.get_model(log_file)
+
+            X = self.preprocessor.apply_preprocessing_pipeline(
+                data, preprocessing_pipeline
+            )
+
+            probabilities = model.predict_proba(X)
+
+            labels = model.classes_[probabilities.argmax(axis=1)]
+
+            class_names = {0: "neg", 1: "pos"}
+
+            predictions = [
+                {
+                    "prediction": class_names[int(label)],
+                    "probabilities": {
+                        class_names[int(c)]: float(p)
+                        for c, p in zip(model.classes_, proba)
+                    },
+                }
+                for label, proba in zip(labels, probabilities)
+            ]
+
+            self.log_writer.log(
+                f"Predicted {len(predictions)} records with production model", **log_dic
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return predictions
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def predict_online(self, records):
+        """
+        Method Name :   predict_online
+        Description :   This method validates the records and predicts them with the cached production model
+
+        Output      :   A list of dicts with prediction and probabilities of neg and pos class for each record
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.predict_online.__name__,
+            __file__,
+            self.pred_online_log,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            data = self.validate_records(records, self.pred_online_log)
+
+            predictions = self.predict_data(data, self.pred_online_log)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return predictions
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
@@ -2,6 +2,7 @@ import pandas as pd
 
 from air_pressure.data_ingestion.data_loader_prediction import Data_Getter_Pred
 from air_pressure.data_preprocessing.preprocessing import Preprocessor
+from air_pressure.model.prod_model_cache import Prod_Model_Cache
 from air_pressure.s3_bucket_operations.s3_operations import S3_Operation
 from utils.logger import App_Logger
 from utils.read_params import get_log_dic, read_params
@@ -36,6 +37,8 @@ class Prediction:
 
         self.preprocessor = Preprocessor(self.pred_log)
 
+        self.prod_model_cache = Prod_Model_Cache()
+
     def find_correct_model_file(self, cluster_number, bucket, log_file):
         """
         Method Name :   find_correct_model_file
@@ -119,7 +122,8 @@ class Prediction:
     def predict_from_model(self):
         """
         Method Name :   predict_from_model
-        Description :   This method is used for loading from prod model dir of s3 bucket and use them for prediction
+        Description :   This method is used for predicting with the production model from the production model cache,
+                        the data is transformed with the preprocessing pipeline which was fitted during training
 
         Version     :   1.2
         Revisions   :   moved setup to cloud
@@ -138,28 +142,14 @@ class Prediction:
 
             data = self.preprocessor.replace_invalid_values(data=data)
 
-            is_null_present = self.preprocessor.is_null_present(data=data)
-
-            if is_null_present:
-                data = self.preprocessor.impute_missing_values(data=data)
-
-            cols_to_drop = ["cd_000", "ch_000"]
+            self.preprocessor.is_null_present(data=data)
 
-            X = self.preprocessor.remove_columns(data, cols_to_drop)
-
-            X = self.preprocessor.scale_numerical_columns(data=X)
-
-            X = self.preprocessor.apply_pca_transform(X_scaled_data=X)
-
-            prod_model_name = self.get_prod_model_name(
-                self.prod_model_dir, self.model_bucket, self.pred_log
+            model, preprocessing_pipeline = self.prod_model_cache.get_model(
+                self.pred_log
             )
 
-            model = self.s3.load_model(
-                prod_model_name,
-                self.model_bucket,
-                self.pred_log,
-                model_dir=self.prod_model_dir,
+            X = self.preprocessor.apply_preprocessing_pipeline(
+                data, preprocessing_pipeline
             )
 
             result = list(model.predict(X))
@@ -0,0 +1,436 @@
+import os
+import threading
+from time import time
+
+from air_pressure.model.model_artifact import Model_Artifact
+from air_pressure.model.tree_ensemble_engine import Tree_Ensemble_Engine
+from air_pressure.s3_bucket_operations.s3_operations import S3_Operation
+from utils.logger import App_Logger
+from utils.read_params import get_log_dic, read_params
+
+_cache_lock = threading.Lock()
+
+_cache_state = {
+    "model": None,
+    "preprocessing_pipeline": None,
+    "prod_files": None,
+    "checked_at": 0.0,
+}
+
+_refreshing = threading.Event()
+
+
+def _reset_after_fork():
+    global _cache_lock
+
+    _cache_lock = threading.Lock()
+
+    _refreshing.clear()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+class Prod_Model_Cache:
+    """
+    Description :   This class shall be used for caching the production model and its preprocessing pipeline in the
+                    process, they are loaded once and the etags of their files are checked again after the ttl. A
+                    new model is loaded by a background thread and swapped in under a lock, so prediction requests
+                    never wait for model io once the cache is warm. A random forest or adaboost model is served
+                    by its tree ensemble engine when the engine was saved for the same model. The files are
+                    downloaded to local_dir and memory mapped, so the workers on one host share the model pages
+    Version     :   1.2
+    Revisions   :   moved setup to cloud
+    """
+
+    def __init__(self):
+        self.config = read_params()
+
+        self.ttl = self.config["prod_model_cache"]["ttl"]
+
+        self.model_bucket = self.config["s3_bucket"]["air_pressure_model_bucket"]
+
+        self.prod_model_dir = self.config["model_dir"]["prod"]
+
+        self.save_format = self.config["save_format"]
+
+        self.tree_engine_config = self.config["tree_engine"]
+
+        self.local_dir = self.config["prod_model_cache"]["local_dir"]
+
+        self.preprocessing_pipeline_file = (
+            self.prod_model_dir
+            + "/"
+            + self.config["preprocessing_pipeline"]
+            + self.save_format
+        )
+
+        self.log_writer = App_Logger()
+
+        self.s3 = S3_Operation()
+
+        self.model_artifact = Model_Artifact()
+
+    def get_prod_model_files(self, log_file):
+        """
+        Method Name :   get_prod_model_files
+        Description :   This method lists the prod model dir in s3 bucket and gets the production model file, the
+                        preprocessing pipeline file and the tree ensemble engine file of the model with their etags,
+                        the files themselves are not downloaded
+
+        Output      :   A tuple of production model file, preprocessing pipeline file and tree ensemble engine file
+                        with their etags, the engine is None when it is not present
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.get_prod_model_files.__name__,
+            __file__,
+            log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            prod_objs = self.s3.get_object_etags(
+                self.prod_model_dir + "/", self.model_bucket, log_file
+            )
+
+            model_files = [
+                key
+                for key in prod_objs
+                if key.endswith(self.save_format)
+                and key != self.preprocessing_pipeline_file
+            ]
+
+            if (
+                len(model_files) == 0
+                or self.preprocessing_pipeline_file not in prod_objs
+            ):
+                raise Exception(
+                    f"No production model or preprocessing pipeline found in {self.prod_model_dir} folder of {self.model_bucket} bucket"
+                )
+
+            engine_file = (
+                model_files[0][: -len(self.save_format)]
+                + self.tree_engine_config["save_format"]
+            )
+
+            prod_files = (
+                (model_files[0], prod_objs[model_files[0]]),
+                (
+                    self.preprocessing_pipeline_file,
+                    prod_objs[self.preprocessing_pipeline_file],
+                ),
+                (engine_file, prod_objs[engine_file])
+                if self.tree_engine_config["enabled"] and engine_file in prod_objs
+                else None,
+            )
+
+            self.log_writer.log(
+                f"Got {prod_files} as production files with etags", **log_dic
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return prod_files
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_local_file(self, prod_file, log_file):
+        """
+        Method Name :   get_local_file
+        Description :   This method downloads a file of the prod model dir to local_dir, the local file is named with
+                        the etag of the file so that it is downloaded once per host. The file is downloaded under a
+                        temp name and then renamed, so that other workers never map a partial file
+
+        Output      :   The path of the local file is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.get_local_file.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            prod_fname, etag = prod_file
+
+            local_file = os.path.join(
+                self.local_dir, etag.strip('"') + "_" + os.path.basename(prod_fname)
+            )
+
+            if os.path.isfile(local_file):
+                self.log_writer.log(f"Found {prod_fname} as {local_file}", **log_dic)
+
+            else:
+                os.makedirs(self.local_dir, exist_ok=True)
+
+                tmp_file = os.path.join(
+                    self.local_dir, f".{os.getpid()}_{os.path.basename(local_file)}"
+                )
+
+                self.s3.download_file(prod_fname, self.model_bucket, tmp_file, log_file)
+
+                os.replace(tmp_file, local_file)
+
+                self.log_writer.log(
+                    f"Downloaded {prod_fname} as {local_file}", **log_dic
+                )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return local_file
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def remove_stale_files(self, prod_files, log_file):
+        """
+        Method Name :   remove_stale_files
+        Description :   This method removes the local files of earlier production models from local_dir, a file which
+                        is still mapped by a worker stays readable until it is unmapped
+
+        Output      :   The stale local files are removed
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.remove_stale_files.__name__,
+            __file__,
+            log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            local_fnames = [
+                etag.strip('"') + "_" + os.path.basename(prod_fname)
+                for prod_fname, etag in filter(None, prod_files)
+            ]
+
+            stale_fnames = [
+                fname
+                for fname in os.listdir(self.local_dir)
+                if fname.startswith(".") is False and fname not in local_fnames
+            ]
+
+            for fname in stale_fnames:
+                os.remove(os.path.join(self.local_dir, fname))
+
+            self.log_writer.log(
+                f"Removed {stale_fnames} from {self.local_dir}", **log_dic
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def load_tree_engine(self, model_file, engine_file, log_file):
+        """
+        Method Name :   load_tree_engine
+        Description :   This method loads the tree ensemble engine of the production model, when the model sha256 in
+                        the metadata of the engine is the sha256 of the production model
+
+        Output      :   The tree ensemble engine is returned, None is returned if the engine does not match the model
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.load_tree_engine.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            model_metadata = self.s3.get_object_metadata(
+                model_file[0], self.model_bucket, log_file
+            )
+
+            engine_metadata = self.s3.get_object_metadata(
+                engine_file[0], self.model_bucket, log_file
+            )
+
+            engine = None
+
+            if (
+                model_metadata is not None
+                and engine_metadata is not None
+                and engine_metadata.get("model_sha256") == model_metadata.get("sha256")
+            ):
+                engine = Tree_Ensemble_Engine()
+
+                engine.load_engine(self.get_local_file(engine_file, log_file), log_file)
+
+                self.log_writer.log(
+                    f"Loaded {engine_file[0]} as production model", **log_dic
+                )
+
+            else:
+                self.log_writer.log(
+                    f"{engine_file[0]} does not match {model_file[0]}, engine is not loaded",
+                    **log_dic,
+                )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return engine
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def load_model(self, log_file):
+        """
+        Method Name :   load_model
+        Description :   This method loads the production model and preprocessing pipeline from s3 bucket when their
+                        files or etags have changed, and swaps them together into the cache under the lock. The tree
+                        ensemble engine is loaded instead of the model when it matches the model. The files are
+                        memory mapped from local_dir, a plain pickle file is unpickled
+
+        Output      :   The production model in the cache is up to date
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.load_model.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            prod_files = self.get_prod_model_files(log_file)
+
+            if prod_files == _cache_state["prod_files"]:
+                self.log_writer.log(
+                    f"Production files {prod_files} are not changed", **log_dic
+                )
+
+            else:
+                model_file, pipeline_file, engine_file = prod_files
+
+                preprocessing_pipeline = self.model_artifact.load_artifact(
+                    self.get_local_file(pipeline_file, log_file), log_file
+                )
+
+                model = None
+
+                if engine_file is not None:
+                    model = self.load_tree_engine(model_file, engine_file, log_file)
+
+                if model is None:
+                    model = self.model_artifact.load_artifact(
+                        self.get_local_file(model_file, log_file), log_file
+                    )
+
+                with _cache_lock:
+                    _cache_state.update(
+                        {
+                            "model": model,
+                            "preprocessing_pipeline": preprocessing_pipeline,
+                            "prod_files": prod_files,
+                        }
+                    )
+
+                self.log_writer.log(
+                    f"Loaded {prod_files} into production model cache", **log_dic
+                )
+
+                self.remove_stale_files(prod_files, log_file)
+
+            _cache_state["checked_at"] = time()
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def refresh(self, log_file):
+        """
+        Method Name :   refresh
+        Description :   This method is run by the background thread, it loads the production model if it has changed
+                        and keeps serving the cached model if the check fails
+
+        Output      :   The production model in the cache is refreshed
+        On Failure  :   Write a log and keep the cached model
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        try:
+            self.load_model(log_file)
+
+        except Exception:
+            _cache_state["checked_at"] = time()
+
+        finally:
+            _refreshing.clear()
+
+    def get_model(self, log_file):
+        """
+        Method Name :   get_model
+        Description :   This method gets the production model from the cache, the model is loaded on the first call
+                        if it was not loaded at startup. When the ttl has passed, a background thread checks for a
+                        new production model and the cached model is returned without waiting for it
+
+        Output      :   The production model and its preprocessing pipeline are returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.get_model.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            if _cache_state["model"] is None:
+                self.load_model(log_file)
+
+            elif time() - _cache_state["checked_at"] > self.ttl:
+                with _cache_lock:
+                    start_refresh = _refreshing.is_set() is False
+
+                    _refreshing.set()
+
+                if start_refresh:
+                    threading.Thread(
+                        target=self.refresh,
+                        args=(log_file,),
+                        name="prod-model-refresh",
+                        daemon=True,
+                    ).start()
+
+            with _cache_lock:
+                model, preprocessing_pipeline, prod_files = (
+                    _cache_state["model"],
+                    _cache_state["preprocessing_pipeline"],
+                    _cache_state["prod_files"],
+                )
+
+            self.log_writer.log(
+                f"Got {prod_files} from production model cache", **log_dic
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return model, preprocessing_pipeline
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
@@ -41,7 +41,7 @@ class Train_Model:
         Description :   This method is responsible for applying the preprocessing functions and then train models againist 
                         training data and them register them in mlflow
 
-        Output      :   A pandas series object consisting of runs for the particular experiment id
+        Output      :   The scores of the trained models and the train id which tags their mlflow runs are returned
         On Failure  :   Write an exception log and then raise an exception
 
         Version     :   1.2
@@ -64,24 +64,21 @@ class Train_Model:
 
             data = self.preprocessor.encode_target_cols(data)
 
-            is_null_present = self.preprocessor.is_null_present(data)
-
-            if is_null_present:
-                data = self.preprocessor.impute_missing_values(data)
-
             X, Y = self.preprocessor.separate_label_feature(data, self.target_col)
 
+            self.preprocessor.is_null_present(X)
+
             cols_to_drop = self.preprocessor.get_columns_with_zero_std_deviation(X)
 
             X = self.preprocessor.remove_columns(X, cols_to_drop)
 
-            X = self.preprocessor.scale_numerical_columns(X)
+            X = self.preprocessor.fit_preprocessing_pipeline(X)
 
-            X = self.preprocessor.apply_pca_transform(X)
+            self.preprocessor.save_preprocessing_pipeline()
 
             X, Y = self.preprocessor.handleImbalance(X, Y)
 
-            model_score_lst = self.tuner.train_and_log_models(
+            model_score_lst, train_id = self.tuner.train_and_log_models(
                 X, Y, self.model_train_log
             )
 
@@ -89,7 +86,7 @@ class Train_Model:
 
             self.log_writer.start_log("exit", **log_dic)
 
-            return model_score_lst
+            return model_score_lst, train_id
 
         except Exception as e:
             self.log_writer.log("Unsuccessful End of Training", **log_dic)
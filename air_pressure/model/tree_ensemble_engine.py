@@ -0,0 +1,403 @@
+import numpy as np
+
+from air_pressure.model.model_artifact import Model_Artifact
+from utils.logger import App_Logger
+from utils.read_params import get_log_dic
+
+
+class Tree_Ensemble_Engine:
+    """
+    Description :   This class shall be used for predicting with a trained random forest or adaboost model from flat
+                    numpy node arrays, the nodes of all the trees are concatenated and all the trees are walked for
+                    the whole batch at once, instead of calling predict_proba of each tree. The leaf values hold the
+                    per tree contribution of the ensemble, so the predictions match the sklearn model exactly.
+                    The arrays are saved as an arrays artifact, so the engine is memory mapped on load and
+                    nothing is unpickled
+    Version     :   1.2
+    Revisions   :   moved setup to cloud
+    """
+
+    def __init__(self):
+        self.arrays = None
+
+        self.log_writer = App_Logger()
+
+        self.model_artifact = Model_Artifact()
+
+    def get_kind(self, model):
+        """
+        Method Name :   get_kind
+        Description :   This method gets the kind of ensemble of the model, random forest and extra trees models are
+                        forest, adaboost models of decision trees are samme.r or samme based on their algorithm
+
+        Output      :   The kind of ensemble is returned, None is returned if the model is not supported
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        model_cls = model.__class__.__name__
+
+        if model_cls in ("RandomForestClassifier", "ExtraTreesClassifier"):
+            kind = "forest"
+
+        elif model_cls == "AdaBoostClassifier":
+            kind = model.algorithm.lower()
+
+        else:
+            return None
+
+        if len(model.classes_) < 2 or not all(
+            hasattr(estimator, "tree_") for estimator in model.estimators_
+        ):
+            return None
+
+        return kind
+
+    def compile_model(self, model, log_file):
+        """
+        Method Name :   compile_model
+        Description :   This method converts the trees of the model into flat node arrays, the children of a node
+                        are stored as right and left pairs and a leaf points to itself. The leaf values are the
+                        normalized class probabilities for forest, the samme.r log probability terms for samme.r,
+                        and the weighted votes of the tree for samme
+
+        Output      :   The node arrays of the model are set in the engine
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.compile_model.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            kind = self.get_kind(model)
+
+            if kind is None:
+                raise Exception(
+                    f"{model.__class__.__name__} model is not supported by tree ensemble engine"
+                )
+
+            classes = model.classes_
+
+            n_classes = len(classes)
+
+            if kind == "samme":
+                weights = model.estimator_weights_
+
+            else:
+                weights = np.ones(len(model.estimators_))
+
+            feature, threshold, left, right, value, roots = [], [], [], [], [], []
+
+            n_nodes, max_depth = 0, 0
+
+            for estimator, weight in zip(model.estimators_, weights):
+                tree = estimator.tree_
+
+                node_idx = np.arange(tree.node_count) + n_nodes
+
+                is_leaf = tree.children_left == -1
+
+                feature.append(np.where(is_leaf, 0, tree.feature))
+
+                threshold.append(np.where(is_leaf, 0.0, tree.threshold))
+
+                left.append(np.where(is_leaf, node_idx, tree.children_left + n_nodes))
+
+                right.append(np.where(is_leaf, node_idx, tree.children_right + n_nodes))
+
+                proba = tree.value[:, 0, :n_classes].astype(np.float64)
+
+                normalizer = proba.sum(axis=1)[:, np.newaxis]
+
+                normalizer[normalizer == 0.0] = 1.0
+
+                proba /= normalizer
+
+                if kind == "samme.r":
+                    np.clip(proba, np.finfo(proba.dtype).eps, None, out=proba)
+
+                    log_proba = np.log(proba)
+
+                    proba = (n_classes - 1) * (
+                        log_proba
+                        - (1.0 / n_classes) * log_proba.sum(axis=1)[:, np.newaxis]
+                    )
+
+                elif kind == "samme":
+                    votes = estimator.classes_.take(np.argmax(proba, axis=1), axis=0)
+
+                    proba = (votes[:, np.newaxis] == classes) * weight
+
+                value.append(proba)
+
+                roots.append(n_nodes)
+
+                n_nodes += tree.node_count
+
+                max_depth = max(max_depth, tree.max_depth)
+
+            left, right = np.concatenate(left), np.concatenate(right)
+
+            self.arrays = {
+                "kind": kind,
+                "classes": classes,
+                "feature": np.concatenate(feature).astype(np.intp),
+                "threshold": np.concatenate(threshold).astype(np.float64),
+                "children": np.stack([right, left], axis=1).ravel().astype(np.intp),
+                "is_leaf": left == np.arange(n_nodes),
+                "value": np.concatenate(value).astype(np.float64),
+                "roots": np.array(roots, dtype=np.intp),
+                "max_depth": max_depth,
+                "weight_sum": float(
+                    model.estimator_weights_.sum() if kind != "forest" else 1.0
+                ),
+            }
+
+            self.set_arrays()
+
+            self.log_writer.log(
+                f"Compiled {len(roots)} trees with {n_nodes} nodes and max depth {max_depth} "
+                f"of {model.__class__.__name__} model as {kind}",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def set_arrays(self):
+        """
+        Method Name :   set_arrays
+        Description :   This method sets the node arrays as attributes of the engine for prediction, the arrays are
+                        not copied so that they stay views on the memory map of a loaded engine. The scalars, which
+                        are loaded as 0-d arrays, are set as python scalars
+
+        Output      :   The node arrays are set as attributes
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        self.kind = str(self.arrays["kind"])
+
+        self.classes_ = self.arrays["classes"]
+
+        self.feature = self.arrays["feature"]
+
+        self.threshold = self.arrays["threshold"]
+
+        self.children = self.arrays["children"]
+
+        self.is_leaf = self.arrays["is_leaf"]
+
+        self.value = self.arrays["value"]
+
+        self.roots = self.arrays["roots"]
+
+        self.max_depth = int(self.arrays["max_depth"])
+
+        self.weight_sum = float(self.arrays["weight_sum"])
+
+    def save_engine(self, log_file):
+        """
+        Method Name :   save_engine
+        Description :   This method saves the node arrays of the engine as an arrays artifact, without pickle
+
+        Output      :   The bytes of the model artifact are returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.save_engine.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            engine_bytes = self.model_artifact.dump_arrays(self.arrays, log_file)
+
+            self.log_writer.log(
+                f"Saved {self.kind} engine to {len(engine_bytes)} bytes", **log_dic
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return engine_bytes
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def load_engine(self, engine_file, log_file):
+        """
+        Method Name :   load_engine
+        Description :   This method loads the node arrays of the engine from the arrays artifact file, the arrays are
+                        memory mapped and nothing is unpickled
+
+        Output      :   The node arrays are set in the engine
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.load_engine.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            self.arrays = self.model_artifact.load_arrays(engine_file, log_file)
+
+            self.set_arrays()
+
+            self.log_writer.log(
+                f"Loaded {self.kind} engine with {len(self.roots)} trees", **log_dic
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_leaves(self, X):
+        """
+        Method Name :   get_leaves
+        Description :   This method walks all the trees for all the rows at once, only the paths which have not
+                        reached a leaf are walked in each step. X is cast to float32 like sklearn trees do, so that
+                        the threshold comparisons are the same
+
+        Output      :   An array of leaf node of each row in each tree is returned
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        X = np.asarray(X, dtype=np.float32)
+
+        n_samples, n_features = X.shape
+
+        X = X.ravel()
+
+        nodes = np.tile(self.roots, n_samples)
+
+        row_offsets = np.repeat(np.arange(n_samples) * n_features, len(self.roots))
+
+        active = np.flatnonzero(~self.is_leaf.take(nodes))
+
+        while active.size > 0:
+            active_nodes = nodes.take(active)
+
+            go_left = X.take(
+                row_offsets.take(active) + self.feature.take(active_nodes)
+            ) <= self.threshold.take(active_nodes)
+
+            active_nodes = self.children.take(active_nodes * 2 + go_left)
+
+            nodes[active] = active_nodes
+
+            active = active[~self.is_leaf.take(active_nodes)]
+
+        return nodes.reshape(n_samples, len(self.roots))
+
+    def get_ensemble_value(self, X):
+        """
+        Method Name :   get_ensemble_value
+        Description :   This method sums the leaf values of the trees in the order of the trees, as sklearn does
+
+        Output      :   An array of summed leaf values of shape (n_samples, n_classes) is returned
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        leaves = self.get_leaves(X)
+
+        pred = self.value[leaves[:, 0]]
+
+        for tree_idx in range(1, leaves.shape[1]):
+            pred += self.value[leaves[:, tree_idx]]
+
+        return pred
+
+    def decision_function(self, X):
+        """
+        Method Name :   decision_function
+        Description :   This method computes the adaboost decision function of X
+
+        Output      :   An array of decision values is returned, of shape (n_samples,) for two classes
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        pred = self.get_ensemble_value(X)
+
+        pred /= self.weight_sum
+
+        if len(self.classes_) == 2:
+            pred[:, 0] *= -1
+
+            return pred.sum(axis=1)
+
+        return pred
+
+    def predict_proba(self, X):
+        """
+        Method Name :   predict_proba
+        Description :   This method predicts the class probabilities of X, the same way as predict_proba of the
+                        sklearn model
+
+        Output      :   An array of class probabilities of shape (n_samples, n_classes) is returned
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        if self.kind == "forest":
+            proba = self.get_ensemble_value(X)
+
+            proba /= len(self.roots)
+
+            return proba
+
+        from sklearn.utils.extmath import softmax
+
+        decision = self.decision_function(X)
+
+        if len(self.classes_) == 2:
+            decision = np.vstack([-decision, decision]).T / 2
+
+        else:
+            decision /= len(self.classes_) - 1
+
+        return softmax(decision, copy=False)
+
+    def predict(self, X):
+        """
+        Method Name :   predict
+        Description :   This method predicts the class labels of X, the same way as predict of the sklearn model
+
+        Output      :   An array of class labels is returned
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        if self.kind == "forest":
+            return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+        decision = self.decision_function(X)
+
+        if len(self.classes_) == 2:
+            return self.classes_.take(decision > 0, axis=0)
+
+        return self.classes_.take(np.argmax(decision, axis=1), axis=0)
@@ -0,0 +1,204 @@
+import json
+import os
+import threading
+from time import perf_counter, sleep, time
+
+from air_pressure.model.prod_model_cache import Prod_Model_Cache
+from utils.logger import App_Logger
+from utils.read_params import get_log_dic, read_params
+
+_warm_up_lock = threading.Lock()
+
+_warm_up_thread = None
+
+_warm_up_state = {"ready": False, "phases": {}, "cold_start": None, "error": None}
+
+
+def _reset_after_fork():
+    global _warm_up_lock, _warm_up_thread
+
+    _warm_up_lock = threading.Lock()
+
+    _warm_up_thread = None
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+class Warm_Up:
+    """
+    Description :   This class shall be used for warming up the prediction service at startup, the production model
+                    and preprocessing pipeline are loaded into the production model cache and one dummy record is
+                    predicted through the online prediction path, so that the first request does not pay for the
+                    model download and the first call of the pipeline and model. The service is ready once the
+                    warm up has succeeded, the duration of each phase and the cold start latency are logged
+    Version     :   1.2
+    Revisions   :   moved setup to cloud
+    """
+
+    def __init__(self, online_prediction):
+        self.config = read_params()
+
+        self.retry_interval = self.config["warm_up"]["retry_interval"]
+
+        self.warm_up_log = self.config["log"]["warm_up"]
+
+        self.online_prediction = online_prediction
+
+        self.prod_model_cache = Prod_Model_Cache()
+
+        self.log_writer = App_Logger()
+
+    def get_process_age(self):
+        """
+        Method Name :   get_process_age
+        Description :   This method gets the seconds since the process was started from /proc, the process start
+                        covers the imports of the app
+
+        Output      :   The age of the process in seconds is returned, None is returned when /proc is not present
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        try:
+            with open("/proc/self/stat") as f:
+                start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+
+            with open("/proc/uptime") as f:
+                uptime = float(f.read().split()[0])
+
+        except (OSError, IndexError, ValueError):
+            return None
+
+        return round(uptime - start_ticks / os.sysconf("SC_CLK_TCK"), 3)
+
+    def warm_up(self):
+        """
+        Method Name :   warm_up
+        Description :   This method loads the production model into the cache and predicts one dummy record with
+                        every column of the prediction schema set to 0, the duration of each phase is saved
+
+        Output      :   The service is marked as ready
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.warm_up.__name__, __file__, self.warm_up_log
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            phases = {}
+
+            start = perf_counter()
+
+            self.prod_model_cache.load_model(self.warm_up_log)
+
+            phases["load_model"] = round(perf_counter() - start, 3)
+
+            start = perf_counter()
+
+            dummy_record = {col: 0.0 for col in self.online_prediction.schema_cols}
+
+            self.online_prediction.predict_online([dummy_record])
+
+            phases["dummy_inference"] = round(perf_counter() - start, 3)
+
+            with _warm_up_lock:
+                _warm_up_state.update(
+                    {
+                        "ready": True,
+                        "phases": phases,
+                        "cold_start": self.get_process_age(),
+                        "error": None,
+                    }
+                )
+
+            self.log_writer.log(
+                f"Warmed up with phase durations {json.dumps(phases)} seconds, "
+                f"ready {_warm_up_state['cold_start']} seconds after process start",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            with _warm_up_lock:
+                _warm_up_state["error"] = str(e)
+
+            self.log_writer.exception_log(e, **log_dic)
+
+    def run(self):
+        """
+        Method Name :   run
+        Description :   This method is run by the background thread, the warm up is retried every retry_interval
+                        seconds until it succeeds, for example when no production model has been trained yet
+
+        Output      :   The service is warmed up
+        On Failure  :   Write a log and retry the warm up
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        while True:
+            try:
+                self.warm_up()
+
+                return
+
+            except Exception:
+                sleep(self.retry_interval)
+
+    def start(self):
+        """
+        Method Name :   start
+        Description :   This method starts the warm up in a background thread, so that the app serves /ready while
+                        it is warming up. Only one warm up thread is run per process
+
+        Output      :   The warm up thread is running
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        global _warm_up_thread
+
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.start.__name__, __file__, self.warm_up_log
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            with _warm_up_lock:
+                if _warm_up_thread is None or _warm_up_thread.is_alive() is False:
+                    _warm_up_thread = threading.Thread(
+                        target=self.run, name="warm-up", daemon=True
+                    )
+
+                    _warm_up_thread.start()
+
+                    self.log_writer.log("Started warm up thread", **log_dic)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_status(self):
+        """
+        Method Name :   get_status
+        Description :   This method gets the readiness of the service with the phase durations of the warm up
+
+        Output      :   A dict of ready, phases, cold_start and error is returned
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        with _warm_up_lock:
+            return {**_warm_up_state, "phases": dict(_warm_up_state["phases"])}
@@ -0,0 +1,456 @@
+from math import ceil
+from time import perf_counter
+
+import numpy as np
+from joblib import Parallel, delayed
+from scipy.stats import norm, rankdata
+from sklearn.base import clone
+from sklearn.model_selection import check_cv
+from sklearn.utils import _safe_indexing
+
+from utils.logger import App_Logger
+from utils.read_params import get_log_dic
+
+
+class TPE_Search:
+    """
+    Description :   This class shall be used for tuning models with a Tree-structured Parzen Estimator, where the
+                    params are suggested from the search space in params.yaml based on the previous trials. Trials
+                    which are worse than the median of previous trials on the first folds are pruned. It follows the
+                    interface of sklearn search engines
+    Version     :   1.2
+    Revisions   :   moved setup to cloud
+    """
+
+    def __init__(
+        self,
+        estimator,
+        param_space,
+        log_file,
+        cv=5,
+        n_jobs=None,
+        verbose=0,
+        n_trials=40,
+        timeout=None,
+        n_startup_trials=10,
+        gamma=0.25,
+        n_ei_candidates=24,
+        prune=True,
+        min_folds=2,
+        random_state=None,
+        budget=None,
+    ):
+        self.estimator = estimator
+
+        self.param_space = param_space
+
+        self.log_file = log_file
+
+        self.cv = cv
+
+        self.n_jobs = n_jobs
+
+        self.verbose = verbose
+
+        self.n_trials = n_trials
+
+        self.timeout = timeout
+
+        self.n_startup_trials = n_startup_trials
+
+        self.gamma = gamma
+
+        self.n_ei_candidates = n_ei_candidates
+
+        self.prune = prune
+
+        self.min_folds = min_folds
+
+        self.random_state = random_state
+
+        self.budget = budget
+
+        self.log_writer = App_Logger()
+
+    def to_internal(self, space, value):
+        """
+        Method Name :   to_internal
+        Description :   This method converts a numeric param value to the internal space, which is log scaled
+                        when log is set for the param
+
+        Output      :   The value in internal space is returned
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        return np.log(value) if space.get("log", False) else np.asarray(value, float)
+
+    def from_internal(self, space, value):
+        """
+        Method Name :   from_internal
+        Description :   This method converts a value from the internal space back to the param value, int params
+                        are rounded and all values are clipped to the bounds of the param
+
+        Output      :   The param value is returned
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        value = np.exp(value) if space.get("log", False) else value
+
+        value = float(np.clip(value, space["low"], space["high"]))
+
+        return int(round(value)) if space["type"] == "int" else value
+
+    def sample_random(self, rng):
+        """
+        Method Name :   sample_random
+        Description :   This method samples the params uniformly from the search space, used for startup trials
+
+        Output      :   A dict of params is returned
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        params = {}
+
+        for name, space in self.param_space.items():
+            if space["type"] == "categorical":
+                params[name] = space["choices"][rng.randint(len(space["choices"]))]
+
+            else:
+                low, high = (
+                    self.to_internal(space, space["low"]),
+                    self.to_internal(space, space["high"]),
+                )
+
+                params[name] = self.from_internal(space, rng.uniform(low, high))
+
+        return params
+
+    def sample_tpe(self, rng, good_trials, bad_trials):
+        """
+        Method Name :   sample_tpe
+        Description :   This method suggests each param independently by sampling candidates from the parzen estimator
+                        of good trials and picking the candidate with the highest ratio of good to bad density
+
+        Output      :   A dict of params is returned
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        params = {}
+
+        for name, space in self.param_space.items():
+            good = [t["params"][name] for t in good_trials]
+
+            bad = [t["params"][name] for t in bad_trials]
+
+            if space["type"] == "categorical":
+                choices = space["choices"]
+
+                p_good = np.array([good.count(c) + 1.0 for c in choices])
+
+                p_bad = np.array([bad.count(c) + 1.0 for c in choices])
+
+                p_good, p_bad = p_good / p_good.sum(), p_bad / p_bad.sum()
+
+                candidates = rng.choice(len(choices), self.n_ei_candidates, p=p_good)
+
+                best = candidates[np.argmax(p_good[candidates] / p_bad[candidates])]
+
+                params[name] = choices[best]
+
+            else:
+                low = float(self.to_internal(space, space["low"]))
+
+                high = float(self.to_internal(space, space["high"]))
+
+                good_mus = np.append(self.to_internal(space, good), (low + high) / 2)
+
+                bad_mus = np.append(self.to_internal(space, bad), (low + high) / 2)
+
+                good_sigmas = self.get_bandwidths(good_mus, low, high)
+
+                bad_sigmas = self.get_bandwidths(bad_mus, low, high)
+
+                idx = rng.randint(len(good_mus), size=self.n_ei_candidates)
+
+                candidates = np.clip(
+                    rng.normal(good_mus[idx], good_sigmas[idx]), low, high
+                )
+
+                log_l = self.get_log_density(candidates, good_mus, good_sigmas)
+
+                log_g = self.get_log_density(candidates, bad_mus, bad_sigmas)
+
+                params[name] = self.from_internal(
+                    space, candidates[np.argmax(log_l - log_g)]
+                )
+
+        return params
+
+    def get_bandwidths(self, mus, low, high):
+        """
+        Method Name :   get_bandwidths
+        Description :   This method gets the bandwidths of the parzen estimator, the last mu is the prior which gets
+                        the whole range as bandwidth
+
+        Output      :   An array of bandwidths is returned
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        width = high - low
+
+        sigmas = np.full(
+            len(mus), max(width * len(mus) ** (-1.0 / 5), width / 100) or 1.0
+        )
+
+        sigmas[-1] = width or 1.0
+
+        return sigmas
+
+    def get_log_density(self, x, mus, sigmas):
+        """
+        Method Name :   get_log_density
+        Description :   This method gets the log density of x under the equally weighted gaussian mixture
+
+        Output      :   An array of log densities is returned
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_pdfs = norm.logpdf(x[:, None], loc=mus[None, :], scale=sigmas[None, :])
+
+        max_log_pdf = log_pdfs.max(axis=1)
+
+        return max_log_pdf + np.log(
+            np.exp(log_pdfs - max_log_pdf[:, None]).mean(axis=1)
+        )
+
+    def should_prune(self, trials, fold_scores):
+        """
+        Method Name :   should_prune
+        Description :   This method checks whether the running mean score of the trial is below the median of the
+                        running mean scores of completed trials over the same folds
+
+        Output      :   True if the trial should be pruned, else False
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        completed = [t for t in trials if t["state"] == "complete"]
+
+        if self.prune is False or len(completed) < self.n_startup_trials:
+            return False
+
+        n_folds = len(fold_scores)
+
+        median_score = np.median([np.mean(t["scores"][:n_folds]) for t in completed])
+
+        return np.mean(fold_scores) < median_score
+
+    def fit(self, X, y, sample_weight=None):
+        """
+        Method Name :   fit
+        Description :   This method runs the trials until the trial budget, the timeout or the budget is used up, the
+                        folds of a trial are fitted in parallel, first min_folds of them and then the rest if the
+                        trial is not pruned. The best params are refitted on the whole data
+
+        Output      :   The search engine with best_params_, best_score_, best_estimator_ and cv_results_ is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.fit.__name__, __file__, self.log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            rng = np.random.RandomState(self.random_state)
+
+            folds = list(check_cv(self.cv, y, classifier=True).split(X, y))
+
+            min_folds = min(self.min_folds, len(folds))
+
+            trials = []
+
+            self.stopped_early_ = False
+
+            start_time = perf_counter()
+
+            with Parallel(n_jobs=self.n_jobs, verbose=self.verbose) as parallel:
+                for trial_number in range(self.n_trials):
+                    if self.budget is not None:
+                        self.budget.check_cancelled()
+
+                    if (
+                        self.timeout is not None
+                        and perf_counter() - start_time > self.timeout
+                    ):
+                        self.stopped_early_ = True
+
+                        self.log_writer.log(
+                            f"Stopped after {trial_number} trials as timeout of {self.timeout} seconds is reached",
+                            **log_dic,
+                        )
+
+                        break
+
+                    if (
+                        trials
+                        and self.budget is not None
+                        and self.budget.is_exhausted()
+                    ):
+                        self.stopped_early_ = True
+
+                        self.log_writer.log(
+                            f"Stopped after {trial_number} trials as budget is exhausted",
+                            **log_dic,
+                        )
+
+                        break
+
+                    completed = sorted(
+                        [t for t in trials if t["state"] == "complete"],
+                        key=lambda t: t["mean_score"],
+                        reverse=True,
+                    )
+
+                    if len(completed) < self.n_startup_trials:
+                        params = self.sample_random(rng)
+
+                    else:
+                        n_good = max(1, ceil(self.gamma * len(completed)))
+
+                        params = self.sample_tpe(
+                            rng,
+                            completed[:n_good],
+                            completed[n_good:]
+                            + [t for t in trials if t["state"] == "pruned"],
+                        )
+
+                    if params in [t["params"] for t in trials]:
+                        params = self.sample_random(rng)
+
+                    trial_start_time = perf_counter()
+
+                    fold_scores = []
+
+                    state = "complete"
+
+                    for fold_slice in (slice(0, min_folds), slice(min_folds, None)):
+                        fold_scores += parallel(
+                            delayed(fit_and_score)(
+                                self.estimator, params, X, y, sample_weight, train, test
+                            )
+                            for train, test in folds[fold_slice]
+                        )
+
+                        if len(fold_scores) < len(folds) and self.should_prune(
+                            trials, fold_scores
+                        ):
+                            state = "pruned"
+
+                            break
+
+                    trials.append(
+                        {
+                            "params": params,
+                            "scores": fold_scores,
+                            "mean_score": float(np.mean(fold_scores)),
+                            "std_score": float(np.std(fold_scores)),
+                            "fit_time": perf_counter() - trial_start_time,
+                            "state": state,
+                        }
+                    )
+
+                    self.log_writer.log(
+                        f"Trial {trial_number} {state} with {params} as params and score as {trials[-1]['mean_score']}",
+                        **log_dic,
+                    )
+
+            mean_test_score = np.array(
+                [
+                    t["mean_score"] if t["state"] == "complete" else np.nan
+                    for t in trials
+                ]
+            )
+
+            self.cv_results_ = {
+                "params": [t["params"] for t in trials],
+                "mean_test_score": mean_test_score,
+                "std_test_score": np.array([t["std_score"] for t in trials]),
+                "mean_fit_time": np.array(
+                    [t["fit_time"] / len(t["scores"]) for t in trials]
+                ),
+                "rank_test_score": rankdata(
+                    -np.nan_to_num(mean_test_score, nan=-np.inf), method="min"
+                ).astype(np.int32),
+                "state": [t["state"] for t in trials],
+            }
+
+            best_idx = int(np.nanargmax(mean_test_score))
+
+            self.best_params_ = trials[best_idx]["params"]
+
+            self.best_score_ = mean_test_score[best_idx]
+
+            self.log_writer.log(
+                f"Got {self.best_params_} as best params with score as {self.best_score_} "
+                f"after {len(trials)} trials in {perf_counter() - start_time:.2f} seconds, "
+                f"{self.cv_results_['state'].count('pruned')} trials were pruned",
+                **log_dic,
+            )
+
+            self.best_estimator_ = clone(self.estimator).set_params(**self.best_params_)
+
+            fit_params = (
+                {} if sample_weight is None else {"sample_weight": sample_weight}
+            )
+
+            self.best_estimator_.fit(X, y, **fit_params)
+
+            self.log_writer.log("Refitted the best params on the whole data", **log_dic)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return self
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+
+def fit_and_score(estimator, params, X, y, sample_weight, train, test):
+    """
+    Method Name :   fit_and_score
+    Description :   This method fits the estimator with params on the train indices and scores it on the test indices
+
+    Output      :   The score on the test indices is returned
+    On Failure  :   Raise an exception
+
+    Version     :   1.2
+    Revisions   :   moved setup to cloud
+    """
+    model = clone(estimator).set_params(**params)
+
+    fit_params = (
+        {}
+        if sample_weight is None
+        else {"sample_weight": _safe_indexing(sample_weight, train)}
+    )
+
+    model.fit(_safe_indexing(X, train), _safe_indexing(y, train), **fit_params)
+
+    return model.score(_safe_indexing(X, test), _safe_indexing(y, test))
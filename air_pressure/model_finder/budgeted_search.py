@@ -0,0 +1,431 @@
+import math
+
+import numpy as np
+from scipy.stats import rankdata
+from sklearn.base import clone
+from sklearn.model_selection import GridSearchCV, check_cv
+from sklearn.utils import resample
+
+from utils.logger import App_Logger
+from utils.read_params import get_log_dic
+
+
+class Budgeted_Search:
+    """
+    Description :   This class shall be used for searching a list of candidate params in chunks, where the budget is
+                    checked between the chunks. When the budget runs out, the best candidate found so far is refitted.
+                    It follows the interface of sklearn search engines
+    Version     :   1.2
+    Revisions   :   moved setup to cloud
+    """
+
+    def __init__(
+        self,
+        estimator,
+        candidates,
+        log_file,
+        budget=None,
+        chunk_size=16,
+        **search_kwargs,
+    ):
+        self.estimator = estimator
+
+        self.candidates = candidates
+
+        self.log_file = log_file
+
+        self.budget = budget
+
+        self.chunk_size = chunk_size
+
+        self.search_kwargs = search_kwargs
+
+        self.log_writer = App_Logger()
+
+    def search_candidates(self, candidates, X, y, fit_params, log_dic, n_searched=0):
+        """
+        Method Name :   search_candidates
+        Description :   This method runs a grid search without refit for each chunk of candidates, until all the
+                        candidates are searched or the budget runs out. The budget is checked before each chunk, once
+                        n_searched plus the candidates searched here is more than zero
+
+        Output      :   A dict of the searched params, mean_test_score, std_test_score and mean_fit_time lists is
+                        returned, stopped_early_ is set when the budget ran out
+        On Failure  :   Raise an exception
+        """
+        results = {
+            "params": [],
+            "mean_test_score": [],
+            "std_test_score": [],
+            "mean_fit_time": [],
+        }
+
+        search_kwargs = dict(self.search_kwargs, **self.get_cv_kwargs(X, y))
+
+        for i in range(0, len(candidates), self.chunk_size):
+            if self.budget is not None:
+                self.budget.check_cancelled()
+
+                if (
+                    n_searched + len(results["params"]) > 0
+                    and self.budget.is_exhausted()
+                ):
+                    self.stopped_early_ = True
+
+                    self.log_writer.log(
+                        f"Budget is exhausted, stopped after searching {len(results['params'])} of {len(candidates)} candidates",
+                        **log_dic,
+                    )
+
+                    break
+
+            chunk_search = GridSearchCV(
+                estimator=self.estimator,
+                param_grid=[
+                    {k: [v] for k, v in c.items()}
+                    for c in candidates[i : i + self.chunk_size]
+                ],
+                refit=False,
+                **search_kwargs,
+            )
+
+            chunk_search.fit(X, y, **fit_params)
+
+            for key in results:
+                results[key] += list(chunk_search.cv_results_[key])
+
+        return results
+
+    def get_cv_kwargs(self, X, y):
+        """
+        Method Name :   get_cv_kwargs
+        Description :   This method gets the search kwargs which are overridden for a chunk search, none for the
+                        whole data
+
+        Output      :   A dict of search kwargs is returned
+        On Failure  :   Raise an exception
+        """
+        return {}
+
+    def set_results(self, results, log_dic, **extra_results):
+        """
+        Method Name :   set_results
+        Description :   This method sets cv_results_, best_params_ and best_score_ from the searched candidates, the
+                        best candidate is taken from the candidates where best_mask is True when it is given
+
+        Output      :   cv_results_, best_params_ and best_score_ are set
+        On Failure  :   Raise an exception
+        """
+        best_mask = extra_results.pop("best_mask", None)
+
+        mean_test_score = np.array(results["mean_test_score"])
+
+        self.cv_results_ = {
+            "params": results["params"],
+            "mean_test_score": mean_test_score,
+            "std_test_score": np.array(results["std_test_score"]),
+            "mean_fit_time": np.array(results["mean_fit_time"]),
+            "rank_test_score": rankdata(
+                -np.nan_to_num(mean_test_score, nan=-np.inf), method="min"
+            ).astype(np.int32),
+            **extra_results,
+        }
+
+        best_scores = np.where(
+            best_mask if best_mask is not None else True, mean_test_score, np.nan
+        )
+
+        best_idx = int(np.nanargmax(best_scores))
+
+        self.best_params_ = results["params"][best_idx]
+
+        self.best_score_ = mean_test_score[best_idx]
+
+        self.log_writer.log(
+            f"Got {self.best_params_} as best params with score as {self.best_score_} "
+            f"from {len(results['params'])} candidates",
+            **log_dic,
+        )
+
+    def refit_best(self, X, y, fit_params, log_dic):
+        """
+        Method Name :   refit_best
+        Description :   This method refits the best params on the whole data
+
+        Output      :   best_estimator_ is set
+        On Failure  :   Raise an exception
+        """
+        self.best_estimator_ = clone(self.estimator).set_params(**self.best_params_)
+
+        self.best_estimator_.fit(X, y, **fit_params)
+
+        self.log_writer.log("Refitted the best params on the whole data", **log_dic)
+
+    def fit(self, X, y, **fit_params):
+        """
+        Method Name :   fit
+        Description :   This method runs a grid search without refit for each chunk of candidates, until all the
+                        candidates are searched or the budget runs out, and refits the best candidate on the whole data
+
+        Output      :   The search engine with best_params_, best_score_, best_estimator_ and cv_results_ is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.fit.__name__, __file__, self.log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            self.stopped_early_ = False
+
+            results = self.search_candidates(self.candidates, X, y, fit_params, log_dic)
+
+            self.set_results(results, log_dic)
+
+            self.refit_best(X, y, fit_params, log_dic)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return self
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+
+class Budgeted_Halving_Search(Budgeted_Search):
+    """
+    Description :   This class shall be used for successive halving over a list of candidate params, where one
+                    iteration is run at a time and the budget is checked between the chunks of each iteration. Each
+                    iteration searches the candidates kept by the last one with factor times the resource, and keeps
+                    the best 1 / factor of them. The resource is either n_samples, where the train rows of each cv
+                    split are subsampled, or a param of the estimator like n_estimators. When the budget runs out,
+                    the best candidate of the last searched iteration is refitted
+    Version     :   1.2
+    Revisions   :   moved setup to cloud
+    """
+
+    def __init__(
+        self,
+        estimator,
+        candidates,
+        log_file,
+        budget=None,
+        chunk_size=16,
+        resource="n_samples",
+        factor=3,
+        min_resources=None,
+        max_resources=None,
+        random_state=None,
+        **search_kwargs,
+    ):
+        super().__init__(
+            estimator, candidates, log_file, budget, chunk_size, **search_kwargs
+        )
+
+        self.resource = resource
+
+        self.factor = factor
+
+        self.min_resources = min_resources
+
+        self.max_resources = max_resources
+
+        self.random_state = random_state
+
+        self.n_resources = None
+
+    def get_cv_kwargs(self, X, y):
+        """
+        Method Name :   get_cv_kwargs
+        Description :   This method gets the cv splits of an iteration with n_samples as resource, the train rows of
+                        each split are subsampled to n_resources / max_resources of them, stratified by the target.
+                        The test rows are kept as they are
+
+        Output      :   A dict with the cv splits is returned, an empty dict when the resource is a param or the whole
+                        data is used
+        On Failure  :   Raise an exception
+        """
+        if self.resource != "n_samples" or self.n_resources >= self.max_resources_:
+            return {}
+
+        y = np.asarray(y)
+
+        cv_splits = []
+
+        for train_idx, test_idx in self.cv_splits_:
+            cv_splits.append(
+                (
+                    resample(
+                        train_idx,
+                        replace=False,
+                        n_samples=max(
+                            int(
+                                len(train_idx) * self.n_resources / self.max_resources_
+                            ),
+                            len(np.unique(y[train_idx])),
+                        ),
+                        random_state=self.random_state,
+                        stratify=y[train_idx],
+                    ),
+                    test_idx,
+                )
+            )
+
+        return {"cv": cv_splits}
+
+    def set_resources(self, X, y):
+        """
+        Method Name :   set_resources
+        Description :   This method sets the cv splits and the min and max resources of the search. With n_samples
+                        as resource, min_resources is the smallest number of rows which lets every candidate be
+                        searched within the halving iterations, but not less than 2 rows per class and split
+
+        Output      :   cv_splits_, min_resources_, max_resources_ and n_iterations_ are set
+        On Failure  :   Raise an exception
+        """
+        cv = check_cv(self.search_kwargs.get("cv", 5), y, classifier=True)
+
+        self.cv_splits_ = list(cv.split(X, y))
+
+        n_required_iterations = 1 + math.floor(
+            math.log(len(self.candidates), self.factor)
+        )
+
+        if self.resource == "n_samples":
+            self.max_resources_ = self.max_resources or len(y)
+
+            smallest = 2 * len(self.cv_splits_) * len(np.unique(y))
+
+            self.min_resources_ = self.min_resources or max(
+                self.max_resources_ // self.factor ** (n_required_iterations - 1),
+                smallest,
+            )
+
+        else:
+            self.max_resources_ = (
+                self.max_resources or self.estimator.get_params()[self.resource]
+            )
+
+            self.min_resources_ = self.min_resources or self.max_resources_
+
+        n_possible_iterations = 1 + math.floor(
+            math.log(max(self.max_resources_ // self.min_resources_, 1), self.factor)
+        )
+
+        self.n_iterations_ = min(n_required_iterations, n_possible_iterations)
+
+    def fit(self, X, y, **fit_params):
+        """
+        Method Name :   fit
+        Description :   This method runs the halving iterations one at a time, until the last iteration is searched
+                        or the budget runs out, and refits the best candidate of the last searched iteration on the
+                        whole data with max_resources
+
+        Output      :   The search engine with best_params_, best_score_, best_estimator_ and cv_results_ is returned,
+                        cv_results_ has the iter and n_resources of each searched candidate
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.fit.__name__, __file__, self.log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            self.stopped_early_ = False
+
+            self.set_resources(X, y)
+
+            results = {
+                "params": [],
+                "mean_test_score": [],
+                "std_test_score": [],
+                "mean_fit_time": [],
+            }
+
+            iters, n_resources = [], []
+
+            candidates = self.candidates
+
+            for i in range(self.n_iterations_):
+                if i == self.n_iterations_ - 1:
+                    self.n_resources = self.max_resources_
+
+                else:
+                    self.n_resources = min(
+                        self.min_resources_ * self.factor ** i, self.max_resources_
+                    )
+
+                if self.resource == "n_samples":
+                    iter_candidates = candidates
+
+                else:
+                    iter_candidates = [
+                        dict(c, **{self.resource: int(self.n_resources)})
+                        for c in candidates
+                    ]
+
+                self.log_writer.log(
+                    f"Iteration {i} of {self.n_iterations_}, searching {len(iter_candidates)} candidates with "
+                    f"{self.n_resources} {self.resource}",
+                    **log_dic,
+                )
+
+                iter_results = self.search_candidates(
+                    iter_candidates,
+                    X,
+                    y,
+                    fit_params,
+                    log_dic,
+                    n_searched=len(results["params"]),
+                )
+
+                for key in results:
+                    results[key] += iter_results[key]
+
+                iters += [i] * len(iter_results["params"])
+
+                n_resources += [self.n_resources] * len(iter_results["params"])
+
+                if self.stopped_early_:
+                    break
+
+                n_keep = math.ceil(len(candidates) / self.factor)
+
+                keep_idx = np.argsort(
+                    -np.nan_to_num(iter_results["mean_test_score"], nan=-np.inf),
+                    kind="stable",
+                )[:n_keep]
+
+                candidates = [candidates[k] for k in keep_idx]
+
+            iters = np.array(iters)
+
+            self.set_results(
+                results,
+                log_dic,
+                iter=iters,
+                n_resources=np.array(n_resources),
+                best_mask=iters == iters.max(),
+            )
+
+            if self.resource != "n_samples":
+                self.best_params_ = dict(
+                    self.best_params_, **{self.resource: int(self.max_resources_)}
+                )
+
+            self.refit_best(X, y, fit_params, log_dic)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return self
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
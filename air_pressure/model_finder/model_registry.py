@@ -0,0 +1,97 @@
+from importlib import import_module
+
+from utils.logger import App_Logger
+from utils.read_params import get_log_dic, read_params
+
+
+class Model_Registry:
+    """
+    Description :   This class shall be used for getting the model families declared in model_registry of params.yaml,
+                    each family is imported from its module and created with its init params, so that a new family
+                    only needs an entry in model_registry and its param grid
+    Version     :   1.2
+    Revisions   :   moved setup to cloud
+    """
+
+    def __init__(self, log_file):
+        self.log_file = log_file
+
+        self.config = read_params()
+
+        self.registry_config = self.config["model_registry"]
+
+        self.log_writer = App_Logger()
+
+    def get_model_names(self, log_file):
+        """
+        Method Name :   get_model_names
+        Description :   This method gets the names of model families which are enabled in model_registry
+
+        Output      :   A list of model names is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.get_model_names.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            model_names = [
+                model_name
+                for model_name, family in self.registry_config.items()
+                if family.get("enabled", True)
+            ]
+
+            self.log_writer.log(
+                f"Got {model_names} as enabled model families", **log_dic
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return model_names
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_model(self, model_name, log_file):
+        """
+        Method Name :   get_model
+        Description :   This method imports the model family from its module and creates it with the init params
+                        from model_registry
+
+        Output      :   An untrained model object is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.get_model.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            family = self.registry_config[model_name]
+
+            model_cls = getattr(import_module(family["module"]), model_name)
+
+            model_params = family.get("params") or {}
+
+            model = model_cls(**model_params)
+
+            self.log_writer.log(
+                f"Created {model_name} from {family['module']} with {model_params} as params",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return model
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
@@ -0,0 +1,242 @@
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+from tempfile import mkdtemp
+from time import perf_counter
+
+import numpy as np
+
+from utils.logger import App_Logger
+from utils.read_params import get_log_dic, read_params
+
+
+class Model_Scheduler:
+    """
+    Description :   This class shall be used for tuning the model families concurrently in a process pool,
+                    where the n_jobs budget from model_utils is split between the model families
+    Version     :   1.2
+    Revisions   :   moved setup to cloud
+    """
+
+    def __init__(self, log_file):
+        self.log_file = log_file
+
+        self.config = read_params()
+
+        self.n_jobs = self.config["model_utils"]["n_jobs"]
+
+        self.scheduler_config = self.config["model_utils"]["scheduler"]
+
+        self.parallel = self.scheduler_config["parallel"]
+
+        self.start_method = self.scheduler_config["start_method"]
+
+        self.shared_data_dir = self.scheduler_config["shared_data_dir"]
+
+        self.log_writer = App_Logger()
+
+    def get_n_jobs_split(self, n_families, log_file):
+        """
+        Method Name :   get_n_jobs_split
+        Description :   This method splits the n_jobs budget between the model families, negative n_jobs are resolved
+                        against the cpu count like joblib does
+
+        Output      :   A list of n_jobs, one for each model family is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.get_n_jobs_split.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            n_cpus = os.cpu_count() or 1
+
+            total_jobs = self.n_jobs if self.n_jobs > 0 else n_cpus + 1 + self.n_jobs
+
+            total_jobs = max(total_jobs, 1)
+
+            per_family, remainder = divmod(total_jobs, n_families)
+
+            n_jobs_lst = [
+                max(per_family + (1 if i < remainder else 0), 1)
+                for i in range(n_families)
+            ]
+
+            self.log_writer.log(
+                f"Split n_jobs budget of {total_jobs} between {n_families} model families as {n_jobs_lst}",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return n_jobs_lst
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def run_jobs(self, func, jobs, log_file):
+        """
+        Method Name :   run_jobs
+        Description :   This method runs func for each of the jobs in a process pool, each job gets its share of the
+                        n_jobs budget as n_jobs kwarg. When parallel is disabled the jobs are run one after the other
+
+        Output      :   A list of results from func is returned in the order in which the jobs finished
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.run_jobs.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            results = []
+
+            start_time = perf_counter()
+
+            if self.parallel is False or len(jobs) == 1:
+                self.log_writer.log(
+                    f"Running {len(jobs)} jobs sequentially in the current process",
+                    **log_dic,
+                )
+
+                for job_name, job_kwargs in jobs:
+                    results.append(func(n_jobs=self.n_jobs, **job_kwargs))
+
+                    self.log_writer.log(
+                        f"Finished {job_name} job in {perf_counter() - start_time:.2f} seconds",
+                        **log_dic,
+                    )
+
+            else:
+                n_jobs_lst = self.get_n_jobs_split(len(jobs), log_file)
+
+                with ProcessPoolExecutor(
+                    max_workers=len(jobs), mp_context=get_context(self.start_method)
+                ) as executor:
+                    futures = {
+                        executor.submit(func, n_jobs=n_jobs, **job_kwargs): job_name
+                        for (job_name, job_kwargs), n_jobs in zip(jobs, n_jobs_lst)
+                    }
+
+                    self.log_writer.log(
+                        f"Submitted {list(futures.values())} jobs to process pool with {self.start_method} start method",
+                        **log_dic,
+                    )
+
+                    for future in as_completed(futures):
+                        results.append(future.result())
+
+                        self.log_writer.log(
+                            f"Finished {futures[future]} job in {perf_counter() - start_time:.2f} seconds",
+                            **log_dic,
+                        )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return results
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def create_shared_arrays(self, arrays, log_file):
+        """
+        Method Name :   create_shared_arrays
+        Description :   This method writes the arrays once to a temp dir in shared_data_dir, so that the process pool
+                        and joblib workers memory map the same buffer instead of getting their own pickled copy.
+                        When shared_data_dir is not set, missing or short on free space, the default temp dir
+                        on disk is used instead, the page cache still shares the mapped files between workers
+
+        Output      :   The temp dir and a dict of array name and its file path are returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.create_shared_arrays.__name__,
+            __file__,
+            log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            arrays_size = sum(np.asarray(arr).nbytes for arr in arrays.values())
+
+            shared_data_dir = self.shared_data_dir
+
+            if shared_data_dir is not None and not os.path.isdir(shared_data_dir):
+                shared_data_dir = None
+
+            if (
+                shared_data_dir is not None
+                and shutil.disk_usage(shared_data_dir).free < 2 * arrays_size
+            ):
+                self.log_writer.log(
+                    f"Not enough free space in {shared_data_dir} for {arrays_size} bytes of shared arrays, "
+                    "falling back to the default temp dir",
+                    **log_dic,
+                )
+
+                shared_data_dir = None
+
+            shared_dir = mkdtemp(prefix="air_pressure_", dir=shared_data_dir)
+
+            array_files = {}
+
+            for name, arr in arrays.items():
+                array_files[name] = os.path.join(shared_dir, name + ".npy")
+
+                np.save(array_files[name], np.ascontiguousarray(arr))
+
+            self.log_writer.log(
+                f"Created shared arrays {list(array_files)} in {shared_dir}", **log_dic
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return shared_dir, array_files
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def remove_shared_arrays(self, shared_dir, log_file):
+        """
+        Method Name :   remove_shared_arrays
+        Description :   This method removes the temp dir with shared arrays
+
+        Output      :   The shared arrays are removed
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.remove_shared_arrays.__name__,
+            __file__,
+            log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            shutil.rmtree(shared_dir, ignore_errors=True)
+
+            self.log_writer.log(f"Removed shared arrays in {shared_dir}", **log_dic)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
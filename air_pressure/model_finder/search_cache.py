@@ -0,0 +1,233 @@
+import json
+import os
+from hashlib import sha256
+
+import numpy as np
+import sklearn
+
+from air_pressure.s3_bucket_operations.s3_operations import S3_Operation
+from utils.logger import App_Logger
+from utils.read_params import get_log_dic, read_params
+
+
+class Search_Cache:
+    """
+    Description :   This class shall be used for caching the hyperparameter search results, keyed by the fingerprint
+                    of the feature matrix, labels, param grid and search settings. The results are stored locally
+                    and in the model bucket when the backend is s3
+    Version     :   1.2
+    Revisions   :   moved setup to cloud
+    """
+
+    def __init__(self, log_file):
+        self.log_file = log_file
+
+        self.config = read_params()
+
+        self.cache_config = self.config["tuning_cache"]
+
+        self.enabled = self.cache_config["enabled"]
+
+        self.backend = self.cache_config["backend"]
+
+        self.cache_dir = self.cache_config["dir"]
+
+        self.model_bucket = self.config["s3_bucket"]["air_pressure_model_bucket"]
+
+        self.s3 = S3_Operation()
+
+        self.log_writer = App_Logger()
+
+    def get_fingerprint(self, model, X, y, param_grid, search_settings, log_file):
+        """
+        Method Name :   get_fingerprint
+        Description :   This method creates a sha256 fingerprint from the model name, model constructor params,
+                        sklearn version, feature matrix, labels, param grid and search settings, the arrays are
+                        hashed from their buffers without copying
+
+        Output      :   A fingerprint as hex string is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.get_fingerprint.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            model_name = model.__class__.__name__
+
+            fingerprint = sha256(model_name.encode())
+
+            for arr in (X, y):
+                arr = np.ascontiguousarray(arr)
+
+                fingerprint.update(f"{arr.shape}{arr.dtype}".encode())
+
+                fingerprint.update(arr)
+
+            fingerprint.update(
+                json.dumps(
+                    [
+                        param_grid,
+                        search_settings,
+                        model.get_params(),
+                        sklearn.__version__,
+                    ],
+                    sort_keys=True,
+                    default=str,
+                ).encode()
+            )
+
+            fingerprint = fingerprint.hexdigest()
+
+            self.log_writer.log(
+                f"Got {fingerprint} as fingerprint for {model_name}", **log_dic
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return fingerprint
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_search_results(self, fingerprint, log_file):
+        """
+        Method Name :   get_search_results
+        Description :   This method gets the cached search results for the fingerprint, first from the local cache dir
+                        and then from the model bucket when the backend is s3
+
+        Output      :   A dict of best params and cv results is returned, None is returned on cache miss
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.get_search_results.__name__,
+            __file__,
+            log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            search_results = None
+
+            cache_file = fingerprint + ".json"
+
+            local_cache_file = os.path.join(self.cache_dir, cache_file)
+
+            bucket_cache_file = self.cache_dir + "/" + cache_file
+
+            if self.enabled is False:
+                self.log_writer.log("Tuning cache is disabled", **log_dic)
+
+            elif os.path.exists(local_cache_file):
+                with open(local_cache_file) as f:
+                    search_results = json.load(f)
+
+                self.log_writer.log(
+                    f"Got search results from {local_cache_file}", **log_dic
+                )
+
+            elif self.backend == "s3":
+                f_obj = self.s3.get_file_object(
+                    bucket_cache_file, self.model_bucket, log_file
+                )
+
+                if isinstance(f_obj, list) is False:
+                    search_results = json.loads(self.s3.read_object(f_obj, log_file))
+
+                    self.log_writer.log(
+                        f"Got search results from {bucket_cache_file} in {self.model_bucket} bucket",
+                        **log_dic,
+                    )
+
+            if search_results is None:
+                self.log_writer.log(f"No search results for {fingerprint}", **log_dic)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return search_results
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def save_search_results(self, fingerprint, best_params, cv_results, log_file):
+        """
+        Method Name :   save_search_results
+        Description :   This method saves the best params and cv results for the fingerprint to the local cache dir,
+                        and uploads them to the model bucket when the backend is s3
+
+        Output      :   Search results are saved in the cache
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.save_search_results.__name__,
+            __file__,
+            log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            if self.enabled is False:
+                self.log_writer.log(
+                    "Tuning cache is disabled, skipped saving search results", **log_dic
+                )
+
+                self.log_writer.start_log("exit", **log_dic)
+
+                return
+
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+            cache_file = fingerprint + ".json"
+
+            local_cache_file = os.path.join(self.cache_dir, cache_file)
+
+            search_results = {
+                "best_params": best_params,
+                "cv_results": {
+                    k: np.asarray(v).tolist() if k != "params" else v
+                    for k, v in cv_results.items()
+                    if not k.startswith("param_")
+                },
+            }
+
+            with open(local_cache_file + ".tmp", "w") as f:
+                json.dump(
+                    search_results,
+                    f,
+                    default=lambda o: o.item() if hasattr(o, "item") else str(o),
+                )
+
+            os.replace(local_cache_file + ".tmp", local_cache_file)
+
+            self.log_writer.log(
+                f"Saved search results to {local_cache_file}", **log_dic
+            )
+
+            if self.backend == "s3":
+                self.s3.upload_file(
+                    local_cache_file,
+                    self.cache_dir + "/" + cache_file,
+                    self.model_bucket,
+                    log_file,
+                    remove=False,
+                )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
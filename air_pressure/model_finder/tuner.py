@@ -1,9 +1,30 @@
+from time import perf_counter
+from uuid import uuid4
+
 import mlflow
-from sklearn.ensemble import AdaBoostClassifier, RandomForestClassifier
+import numpy as np
 from sklearn.metrics import accuracy_score, roc_auc_score
-from sklearn.model_selection import GridSearchCV, train_test_split
+from sklearn.model_selection import (
+    ParameterGrid,
+    ParameterSampler,
+    StratifiedKFold,
+    train_test_split,
+)
+from sklearn.utils.class_weight import compute_sample_weight
 
 from air_pressure.mlflow_utils.mlflow_operations import MLFlow_Operation
+from air_pressure.mlflow_utils.mlflow_spool import MLFlow_Spool
+from air_pressure.model.tree_ensemble_engine import Tree_Ensemble_Engine
+from air_pressure.model_finder.bayes_search import TPE_Search
+from air_pressure.model_finder.budgeted_search import (
+    Budgeted_Halving_Search,
+    Budgeted_Search,
+)
+from air_pressure.model_finder.model_registry import Model_Registry
+from air_pressure.model_finder.scheduler import Model_Scheduler
+from air_pressure.model_finder.search_cache import Search_Cache
+from air_pressure.model_finder.tuning_budget import Tuning_Budget
+from air_pressure.model_finder.warm_start_search import Warm_Start_Search
 from air_pressure.s3_bucket_operations.s3_operations import S3_Operation
 from utils.logger import App_Logger
 from utils.read_params import get_log_dic, read_params
@@ -26,10 +47,28 @@ class Model_Finder:
 
         self.mlflow_op = MLFlow_Operation(log_file)
 
-        self.tuner_kwargs = self.config["model_utils"]
+        self.mlflow_spool = MLFlow_Spool()
+
+        self.search_config = self.config["model_utils"]["search"]
+
+        self.search_strategy = self.search_config["strategy"]
+
+        self.log_top_n = self.search_config["log_top_n"]
+
+        self.tuner_kwargs = {
+            k: v
+            for k, v in self.config["model_utils"].items()
+            if k not in ("search", "scheduler", "budget")
+        }
+
+        self.budget_config = self.config["model_utils"]["budget"]
+
+        self.budget = None
 
         self.split_kwargs = self.config["base"]
 
+        self.random_state = self.config["base"]["random_state"]
+
         self.run_name = self.config["mlflow_config"]["run_name"]
 
         self.train_model_dir = self.config["model_dir"]["trained"]
@@ -40,27 +79,35 @@ class Model_Finder:
 
         self.save_format = self.config["save_format"]
 
+        self.tree_engine_config = self.config["tree_engine"]
+
+        self.imbalance_strategy = self.config["imbalance"]["strategy"]
+
+        self.class_weight = self.config["imbalance"]["class_weight"]
+
         self.log_writer = App_Logger()
 
-        self.ada_model = AdaBoostClassifier()
+        self.scheduler = Model_Scheduler(log_file)
+
+        self.search_cache = Search_Cache(log_file)
 
-        self.rf_model = RandomForestClassifier()
+        self.model_registry = Model_Registry(log_file)
 
-    def get_adaboost_model(self, train_x, train_y):
+    def get_tuned_model(self, model_name, train_x, train_y):
         """
-        Method Name :   get_adaboost_model
-        Description :   get the parameters for AdaBoost Algorithm which give the best accuracy.
+        Method Name :   get_tuned_model
+        Description :   get the parameters for the model family from model registry which give the best accuracy.
                         Use Hyper Parameter Tuning.
-        
+
         Output      :   The model with the best parameters
         On Failure  :   Write an exception log and then raise an exception
-        
+
         Version     :   1.2
         Revisions   :   moved setup to cloud
         """
         log_dic = get_log_dic(
             self.__class__.__name__,
-            self.get_adaboost_model.__name__,
+            self.get_tuned_model.__name__,
             __file__,
             self.log_file,
         )
@@ -68,103 +115,135 @@ class Model_Finder:
         self.log_writer.start_log("start", **log_dic)
 
         try:
-            self.ada_model_name = self.ada_model.__class__.__name__
+            model = self.model_registry.get_model(model_name, self.log_file)
 
-            self.adaboost_best_params = self.get_model_params(
-                self.ada_model, train_x, train_y, self.log_file
+            model, best_params, _ = self.get_model_params(
+                model, train_x, train_y, self.log_file
             )
 
             self.log_writer.log(
-                f"{self.ada_model_name} model best params are {self.adaboost_best_params}",
+                f"Got {model_name} refitted with {best_params} as best params from search",
                 **log_dic,
             )
 
-            self.ada_model.set_params(**self.adaboost_best_params)
+            self.log_writer.start_log("exit", **log_dic)
 
-            self.log_writer.log(
-                f"Initialized {self.ada_model_name} with {self.adaboost_best_params} as params",
-                **log_dic,
-            )
+            return model
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_model_score(self, model, test_x, test_y, log_file):
+        """
+        Method Name :   get_model_score
+        Description :   This method gets model score againist the test data
+
+        Output      :   A model score is returned 
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.get_model_score.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
 
-            self.ada_model.fit(train_x, train_y)
+        try:
+            model_name = model.__class__.__name__
+
+            preds = model.predict(test_x)
 
             self.log_writer.log(
-                f"Created {self.ada_model_name} based on the {self.adaboost_best_params} as params",
-                **log_dic,
+                f"Used {model_name} model to get predictions on test data", **log_dic
             )
 
+            if len(test_y.unique()) == 1:
+                model_score = accuracy_score(test_y, preds)
+
+                self.log_writer.log(
+                    f"Accuracy for {model_name} is {model_score}", **log_dic
+                )
+
+            else:
+                model_score = roc_auc_score(test_y, preds)
+
+                self.log_writer.log(
+                    f"AUC score for {model_name} is {model_score}", **log_dic
+                )
+
             self.log_writer.start_log("exit", **log_dic)
 
-            return self.ada_model
+            return model_score
 
         except Exception as e:
             self.log_writer.exception_log(e, **log_dic)
 
-    def get_rf_model(self, train_x, train_y):
+    def get_fit_params(self, model, y_train, log_file):
         """
-        Method Name :   get_rf_model
-        Description :   get the parameters for Random Forest Algorithm which give the best accuracy.
-                        Use Hyper Parameter Tuning.
-        
-        Output      :   The model with the best parameters
+        Method Name :   get_fit_params
+        Description :   This method gets the fit params for the model based on the imbalance strategy. For class_weight
+                        strategy, class_weight is set on models which support it, else sample weights are used
+
+        Output      :   A dict of fit params is returned
         On Failure  :   Write an exception log and then raise an exception
-        
+
         Version     :   1.2
-        
         Revisions   :   moved setup to cloud
         """
         log_dic = get_log_dic(
-            self.__class__.__name__, self.get_rf_model.__name__, __file__, self.log_file
+            self.__class__.__name__, self.get_fit_params.__name__, __file__, log_file
         )
 
         self.log_writer.start_log("start", **log_dic)
 
         try:
-            self.rf_model_name = self.rf_model.__class__.__name__
+            fit_params = {}
 
-            self.rf_best_params = self.get_model_params(
-                self.rf_model, train_x, train_y, self.log_file
-            )
-
-            self.log_writer.log(
-                f"{self.rf_model_name} model best params are {self.rf_best_params}",
-                **log_dic,
-            )
+            model_name = model.__class__.__name__
 
-            self.rf_model.set_params(**self.rf_best_params)
+            if self.imbalance_strategy == "class_weight":
+                if "class_weight" in model.get_params():
+                    model.set_params(class_weight=self.class_weight)
 
-            self.log_writer.log(
-                f"Initialized {self.rf_model_name} with {self.rf_best_params} as params",
-                **log_dic,
-            )
+                    self.log_writer.log(
+                        f"Set class_weight as {self.class_weight} for {model_name}",
+                        **log_dic,
+                    )
 
-            self.rf_model.fit(train_x, train_y)
+                else:
+                    fit_params["sample_weight"] = compute_sample_weight(
+                        self.class_weight, y_train
+                    )
 
-            self.log_writer.log(
-                f"Created {self.rf_model_name} based on the {self.rf_best_params} as params",
-                **log_dic,
-            )
+                    self.log_writer.log(
+                        f"Computed {self.class_weight} sample weights for {model_name}",
+                        **log_dic,
+                    )
 
             self.log_writer.start_log("exit", **log_dic)
 
-            return self.rf_model
+            return fit_params
 
         except Exception as e:
             self.log_writer.exception_log(e, **log_dic)
 
-    def get_model_score(self, model, test_x, test_y, log_file):
+    def get_model_params(self, model, x_train, y_train, log_file):
         """
-        Method Name :   get_model_score
-        Description :   This method gets model score againist the test data
+        Method Name :   get_model_params
+        Description :   This method searches the model parameters based on model_key_name and train data, the search
+                        engine refits the best model on the whole train data, so it is returned as it is. When the
+                        search results are cached for the same data and param grid, only the final fit is done
 
-        Output      :   A model score is returned 
+        Output      :   Best model refitted on train data, best model parameters and cv results are returned
         On Failure  :   Write an exception log and then raise an exception
 
         Version     :   1.2
         Revisions   :   moved setup to cloud
         """
         log_dic = get_log_dic(
-            self.__class__.__name__, self.get_model_score.__name__, __file__, log_file
+            self.__class__.__name__, self.get_model_params.__name__, __file__, log_file
         )
 
         self.log_writer.start_log("start", **log_dic)
@@ -172,74 +251,345 @@ class Model_Finder:
         try:
             model_name = model.__class__.__name__
 
-            preds = model.predict(test_x)
+            model_param_grid = (
+                self.config["search_space"][model_name]
+                if self.search_strategy == "bayes"
+                else self.config[model_name]
+            )
 
-            self.log_writer.log(
-                f"Used {model_name} model to get predictions on test data", **log_dic
+            fit_params = self.get_fit_params(model, y_train, log_file)
+
+            fingerprint = self.search_cache.get_fingerprint(
+                model,
+                x_train,
+                y_train,
+                model_param_grid,
+                {
+                    "search": self.search_config,
+                    "cv": self.config["model_utils"]["cv"],
+                    "random_state": self.random_state,
+                    "imbalance": self.config["imbalance"],
+                },
+                log_file,
             )
 
-            if len(test_y.unique()) == 1:
-                model_score = accuracy_score(test_y, preds)
+            search_results = self.search_cache.get_search_results(fingerprint, log_file)
+
+            if search_results is not None:
+                best_params = search_results["best_params"]
+
+                cv_results = search_results["cv_results"]
+
+                model.set_params(**best_params)
+
+                model.fit(x_train, y_train, **fit_params)
 
                 self.log_writer.log(
-                    f"Accuracy for {model_name} is {model_score}", **log_dic
+                    f"Skipped search for {model_name} model, fitted with {best_params} as cached best params",
+                    **log_dic,
                 )
 
-            else:
-                model_score = roc_auc_score(test_y, preds)
+                self.log_cv_results(model_name, cv_results, log_file)
 
-                self.log_writer.log(
-                    f"AUC score for {model_name} is {model_score}", **log_dic
+                self.log_writer.start_log("exit", **log_dic)
+
+                return model, best_params, cv_results
+
+            model_grid = self.get_search_engine(model, model_param_grid, log_file)
+
+            start_time = perf_counter()
+
+            model_grid.fit(x_train, y_train, **fit_params)
+
+            self.log_writer.log(
+                f"Found the best params for {model_name} model based on {model_param_grid} as params "
+                f"using {self.search_strategy} search in {perf_counter() - start_time:.2f} seconds "
+                f"with best score as {model_grid.best_score_}",
+                **log_dic,
+            )
+
+            self.log_cv_results(model_name, model_grid.cv_results_, log_file)
+
+            if getattr(model_grid, "stopped_early_", False) is False:
+                self.search_cache.save_search_results(
+                    fingerprint,
+                    model_grid.best_params_,
+                    model_grid.cv_results_,
+                    log_file,
                 )
 
             self.log_writer.start_log("exit", **log_dic)
 
-            return model_score
+            return (
+                model_grid.best_estimator_,
+                model_grid.best_params_,
+                model_grid.cv_results_,
+            )
 
         except Exception as e:
             self.log_writer.exception_log(e, **log_dic)
 
-    def get_model_params(self, model, x_train, y_train, log_file):
+    def log_cv_results(self, model_name, cv_results, log_file):
         """
-        Method Name :   get_model_params
-        Description :   This method gets the model parameters based on model_key_name and train data
+        Method Name :   log_cv_results
+        Description :   This method logs the top ranked candidates from the cv results of the search. The cv results
+                        of successive halving have rows for every iteration, only the candidates of the last
+                        iteration are ranked, so that the scores on fewer resources are not logged as the top
 
-        Output      :   Best model parameters are returned
+        Output      :   Top ranked candidates are written to the log file
         On Failure  :   Write an exception log and then raise an exception
 
         Version     :   1.2
         Revisions   :   moved setup to cloud
         """
         log_dic = get_log_dic(
-            self.__class__.__name__, self.get_model_params.__name__, __file__, log_file
+            self.__class__.__name__, self.log_cv_results.__name__, __file__, log_file
         )
 
         self.log_writer.start_log("start", **log_dic)
 
         try:
-            model_name = model.__class__.__name__
+            candidate_idx = range(len(cv_results["params"]))
+
+            if "iter" in cv_results:
+                last_iter = max(cv_results["iter"])
 
-            model_param_grid = self.config[model_name]
+                candidate_idx = [
+                    i for i in candidate_idx if cv_results["iter"][i] == last_iter
+                ]
 
-            model_grid = GridSearchCV(
-                estimator=model, param_grid=model_param_grid, **self.tuner_kwargs
+            ranked_idx = sorted(
+                candidate_idx, key=lambda i: cv_results["rank_test_score"][i],
             )
 
             self.log_writer.log(
-                f"Initialized {model_grid.__class__.__name__}  with {model_param_grid} as params",
+                f"Searched {len(cv_results['params'])} candidates for {model_name}, "
+                f"top {self.log_top_n} of {len(ranked_idx)} final candidates are",
                 **log_dic,
             )
 
-            model_grid.fit(x_train, y_train)
+            for i in ranked_idx[: self.log_top_n]:
+                self.log_writer.log(
+                    f"rank : {cv_results['rank_test_score'][i]}, "
+                    f"mean_test_score : {cv_results['mean_test_score'][i]:.5f}, "
+                    f"std_test_score : {cv_results['std_test_score'][i]:.5f}, "
+                    f"mean_fit_time : {cv_results['mean_fit_time'][i]:.2f}, "
+                    f"params : {cv_results['params'][i]}",
+                    **log_dic,
+                )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_search_engine(self, model, model_param_grid, log_file):
+        """
+        Method Name :   get_search_engine
+        Description :   This method gets the hyperparameter search engine based on the search strategy in model_utils.
+                        grid runs an exhaustive search, random samples n_iter candidates from the grid, halving
+                        runs successive halving over the training rows or n_estimators of the model, warm_start
+                        grows forests across the n_estimators grid points and bayes runs TPE over the search space.
+                        Every search engine checks the tuning budget, a search engine which does not is rejected
+
+        Output      :   A search engine which is not yet fitted is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.get_search_engine.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            if self.search_strategy == "grid":
+                search_engine = Budgeted_Search(
+                    estimator=model,
+                    candidates=list(ParameterGrid(model_param_grid)),
+                    log_file=log_file,
+                    budget=self.budget,
+                    chunk_size=self.budget_config["chunk_size"],
+                    **self.tuner_kwargs,
+                )
+
+            elif self.search_strategy == "random":
+                search_engine = Budgeted_Search(
+                    estimator=model,
+                    candidates=list(
+                        ParameterSampler(
+                            model_param_grid,
+                            random_state=self.random_state,
+                            **self.search_config["random"],
+                        )
+                    ),
+                    log_file=log_file,
+                    budget=self.budget,
+                    chunk_size=self.budget_config["chunk_size"],
+                    **self.tuner_kwargs,
+                )
+
+            elif self.search_strategy == "halving":
+                halving_kwargs = dict(self.search_config["halving"])
+
+                resource = halving_kwargs.get("resource", "n_samples")
+
+                if resource != "n_samples" and resource not in model.get_params():
+                    self.log_writer.log(
+                        f"{model.__class__.__name__} does not have {resource} param, using n_samples as resource",
+                        **log_dic,
+                    )
+
+                    resource = "n_samples"
+
+                if resource != "n_samples" and resource in model_param_grid:
+                    resource_values = model_param_grid[resource]
+
+                    model_param_grid = {
+                        k: v for k, v in model_param_grid.items() if k != resource
+                    }
+
+                    halving_kwargs["min_resources"] = min(resource_values)
+
+                    halving_kwargs["max_resources"] = max(resource_values)
+
+                halving_kwargs["resource"] = resource
+
+                search_engine = Budgeted_Halving_Search(
+                    estimator=model,
+                    candidates=list(ParameterGrid(model_param_grid)),
+                    log_file=log_file,
+                    budget=self.budget,
+                    chunk_size=self.budget_config["chunk_size"],
+                    random_state=self.random_state,
+                    **halving_kwargs,
+                    **self.tuner_kwargs,
+                )
+
+            elif self.search_strategy == "warm_start":
+                model_params = model.get_params()
+
+                if "warm_start" in model_params and "n_estimators" in model_param_grid:
+                    search_engine = Warm_Start_Search(
+                        estimator=model,
+                        param_grid=model_param_grid,
+                        log_file=log_file,
+                        random_state=self.random_state,
+                        budget=self.budget,
+                        chunk_size=self.budget_config["chunk_size"],
+                        **self.search_config["warm_start"],
+                        **self.tuner_kwargs,
+                    )
+
+                else:
+                    self.log_writer.log(
+                        f"{model.__class__.__name__} does not support warm_start, using grid search",
+                        **log_dic,
+                    )
+
+                    search_engine = Budgeted_Search(
+                        estimator=model,
+                        candidates=list(ParameterGrid(model_param_grid)),
+                        log_file=log_file,
+                        budget=self.budget,
+                        chunk_size=self.budget_config["chunk_size"],
+                        **self.tuner_kwargs,
+                    )
+
+            elif self.search_strategy == "bayes":
+                search_engine = TPE_Search(
+                    estimator=model,
+                    param_space=model_param_grid,
+                    log_file=log_file,
+                    random_state=self.random_state,
+                    budget=self.budget,
+                    **self.search_config["bayes"],
+                    **self.tuner_kwargs,
+                )
+
+            else:
+                raise ValueError(
+                    f"{self.search_strategy} is not a valid search strategy"
+                )
+
+            if (
+                self.budget is not None
+                and getattr(search_engine, "budget", None) is None
+            ):
+                raise ValueError(
+                    f"{search_engine.__class__.__name__} does not check the tuning budget"
+                )
 
             self.log_writer.log(
-                f"Found the best params for {model_name} model based on {model_param_grid} as params",
+                f"Initialized {search_engine.__class__.__name__} with {model_param_grid} as params",
                 **log_dic,
             )
 
             self.log_writer.start_log("exit", **log_dic)
 
-            return model_grid.best_params_
+            return search_engine
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def save_tree_engine(self, model, model_sha256, test_x, log_file):
+        """
+        Method Name :   save_tree_engine
+        Description :   This method compiles the trained random forest or adaboost model into a tree ensemble engine
+                        and saves it to the trained model dir with the sha256 of the model as metadata. The engine is
+                        saved only when its predictions on the test data are the same as the predictions of the model
+
+        Output      :   The tree ensemble engine of the model is saved in s3 bucket
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.save_tree_engine.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            model_name = model.__class__.__name__
+
+            engine = Tree_Ensemble_Engine()
+
+            if engine.get_kind(model) is None:
+                self.log_writer.log(
+                    f"{model_name} model is not supported by tree ensemble engine",
+                    **log_dic,
+                )
+
+            else:
+                engine.compile_model(model, log_file)
+
+                if np.array_equal(engine.predict(test_x), model.predict(test_x)):
+                    self.s3.save_model(
+                        engine,
+                        self.train_model_dir,
+                        self.model_bucket,
+                        log_file,
+                        model_bytes=engine.save_engine(log_file),
+                        model_name=model_name,
+                        file_format=self.tree_engine_config["save_format"],
+                        extra_metadata={"model_sha256": model_sha256},
+                    )
+
+                    self.log_writer.log(
+                        f"Saved tree ensemble engine of {model_name} model", **log_dic
+                    )
+
+                else:
+                    self.log_writer.log(
+                        f"Predictions of tree ensemble engine do not match {model_name} model, engine is not saved",
+                        **log_dic,
+                    )
+
+            self.log_writer.start_log("exit", **log_dic)
 
         except Exception as e:
             self.log_writer.exception_log(e, **log_dic)
@@ -255,6 +605,17 @@ class Model_Finder:
         self.log_writer.start_log("start", **log_dic)
 
         try:
+            self.budget = Tuning_Budget(
+                self.budget_config["total_timeout"], self.budget_config["cancel_file"]
+            )
+
+            train_id = uuid4().hex
+
+            self.log_writer.log(
+                f"Started tuning with {self.budget_config['total_timeout']} seconds as total budget",
+                **log_dic,
+            )
+
             x_train, x_test, y_train, y_test = train_test_split(
                 X_data, Y_data, **self.split_kwargs
             )
@@ -270,25 +631,98 @@ class Model_Finder:
 
             self.log_writer.log("Got trained models", **log_dic)
 
+            self.budget.check_cancelled()
+
+            model_bytes_lst = []
+
             for _, tm in enumerate(model_lst):
-                self.s3.save_model(
-                    tm[1], self.train_model_dir, self.model_bucket, log_file
+                model_bytes = self.mlflow_op.get_model_bytes(tm[1])
+
+                model_sha256 = self.s3.save_model(
+                    tm[1],
+                    self.train_model_dir,
+                    self.model_bucket,
+                    log_file,
+                    model_bytes=model_bytes,
+                )
+
+                if self.tree_engine_config["enabled"]:
+                    self.save_tree_engine(tm[1], model_sha256, x_test, log_file)
+
+                model_bytes_lst.append(model_bytes)
+
+            if self.mlflow_spool.enabled:
+                for tm, model_bytes in zip(model_lst, model_bytes_lst):
+                    self.mlflow_spool.put_job(
+                        "log_model",
+                        {"model_score": float(tm[0]), "train_id": train_id},
+                        log_file,
+                        model_bytes=model_bytes,
+                    )
+
+                self.log_writer.log(
+                    "Saved all trained models and put them in mlflow spool", **log_dic
                 )
 
+            else:
                 self.mlflow_op.set_mlflow_tracking_uri()
 
                 self.mlflow_op.set_mlflow_experiment(self.exp_name)
 
-                with mlflow.start_run(run_name=self.run_name):
-                    self.mlflow_op.log_all_for_model(tm[1], tm[0])
+                for tm, model_bytes in zip(model_lst, model_bytes_lst):
+                    with mlflow.start_run(
+                        run_name=self.run_name, tags={"train_id": train_id}
+                    ):
+                        self.mlflow_op.log_all_for_model(
+                            tm[1], tm[0], model_bytes=model_bytes
+                        )
+
+                self.log_writer.log(
+                    "Saved and logged all trained models to mlflow", **log_dic
+                )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return model_score_lst, train_id
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_cv_folds(self, train_x, train_y, log_file):
+        """
+        Method Name :   get_cv_folds
+        Description :   This method computes the stratified cv fold indices once, so that they are shared by the
+                        search engines of all the model families
+
+        Output      :   A list of train and test indices for each fold is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.get_cv_folds.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            skf = StratifiedKFold(
+                n_splits=self.config["model_utils"]["cv"],
+                shuffle=True,
+                random_state=self.random_state,
+            )
+
+            cv_folds = list(skf.split(train_x, train_y))
 
             self.log_writer.log(
-                "Saved and logged all trained models to mlflow", **log_dic
+                f"Computed {len(cv_folds)} stratified cv folds for {len(train_y)} rows",
+                **log_dic,
             )
 
             self.log_writer.start_log("exit", **log_dic)
 
-            return model_score_lst
+            return cv_folds
 
         except Exception as e:
             self.log_writer.exception_log(e, **log_dic)
@@ -296,7 +730,8 @@ class Model_Finder:
     def get_trained_models(self, train_x, train_y, test_x, test_y, log_file):
         """
         Method Name :   get_trained_models
-        Description :   Find out the Model which has the best score.
+        Description :   Find out the Model which has the best score. The model families enabled in model registry
+                        are tuned concurrently using the model scheduler
         
         Output      :   The best model name and the model object
         On Failure  :   Write an exception log and then raise an exception
@@ -314,31 +749,92 @@ class Model_Finder:
         self.log_writer.start_log("start", **log_dic)
 
         try:
-            self.ada_model = self.get_adaboost_model(train_x=train_x, train_y=train_y)
+            cv_folds = self.get_cv_folds(train_x, train_y, log_file)
 
-            self.ada_model_score = self.get_model_score(
-                self.ada_model, test_x, test_y, log_file,
+            shared_dir, array_files = self.scheduler.create_shared_arrays(
+                {"train_x": train_x, "train_y": train_y}, log_file
             )
 
-            self.rf_model = self.get_rf_model(train_x=train_x, train_y=train_y)
-
-            self.rf_model_score = self.get_model_score(
-                self.rf_model, test_x, test_y, log_file,
-            )
+            jobs = [
+                (
+                    model_name,
+                    {
+                        "log_file": log_file,
+                        "model_name": model_name,
+                        "train_x_file": array_files["train_x"],
+                        "train_y_file": array_files["train_y"],
+                        "cv_folds": cv_folds,
+                        "budget": self.budget,
+                        "test_x": test_x,
+                        "test_y": test_y,
+                    },
+                )
+                for model_name in self.model_registry.get_model_names(log_file)
+            ]
 
-            self.log_writer.start_log("exit", **log_dic)
+            try:
+                model_lst = self.scheduler.run_jobs(tune_model_family, jobs, log_file)
 
-            model_lst = [
-                (self.rf_model_score, self.rf_model),
-                (self.ada_model_score, self.ada_model),
-            ]
+            finally:
+                self.scheduler.remove_shared_arrays(shared_dir, log_file)
 
             model_score_lst = [
-                (float(self.rf_model_score), self.rf_model.__class__.__name__),
-                (float(self.ada_model_score), self.ada_model.__class__.__name__),
+                (float(model_score), model.__class__.__name__)
+                for model_score, model in model_lst
             ]
 
+            self.log_writer.log(
+                f"Got scores for trained models as {model_score_lst}", **log_dic
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
             return model_lst, model_score_lst
 
         except Exception as e:
             self.log_writer.exception_log(e, **log_dic)
+
+
+def tune_model_family(
+    log_file,
+    model_name,
+    train_x_file,
+    train_y_file,
+    cv_folds,
+    budget,
+    test_x,
+    test_y,
+    n_jobs,
+):
+    """
+    Method Name :   tune_model_family
+    Description :   This method tunes a model family with its share of the n_jobs budget and scores it on test data.
+                    The train data is memory mapped from the shared arrays and the precomputed cv folds are used.
+                    The search stops when the family budget or the total budget runs out.
+                    It is defined at module level, so that it can be submitted to the process pool of the model scheduler
+
+    Output      :   A tuple of model score and trained model is returned
+    On Failure  :   Write an exception log and then raise an exception
+
+    Version     :   1.2
+    Revisions   :   moved setup to cloud
+    """
+    model_finder = Model_Finder(log_file)
+
+    model_finder.tuner_kwargs["n_jobs"] = n_jobs
+
+    model_finder.tuner_kwargs["cv"] = cv_folds
+
+    model_finder.budget = budget.get_family_budget(
+        model_finder.budget_config["family_timeout"]
+    )
+
+    train_x = np.load(train_x_file, mmap_mode="r")
+
+    train_y = np.load(train_y_file, mmap_mode="r")
+
+    model = model_finder.get_tuned_model(model_name, train_x, train_y)
+
+    model_score = model_finder.get_model_score(model, test_x, test_y, log_file)
+
+    return model_score, model
@@ -0,0 +1,107 @@
+import os
+from time import time
+
+
+class Tuning_Budget:
+    """
+    Description :   This class shall be used for the wall clock budget and cancellation of the tuning stage. The
+                    deadline is an absolute time and cancellation is requested through a cancel file, so the budget
+                    can be passed to the process pool of the model scheduler
+    Version     :   1.2
+    Revisions   :   moved setup to cloud
+    """
+
+    def __init__(self, timeout, cancel_file):
+        self.deadline = None if timeout is None else time() + timeout
+
+        self.cancel_file = cancel_file
+
+    def get_family_budget(self, timeout):
+        """
+        Method Name :   get_family_budget
+        Description :   This method gets the budget for a model family, which ends at the family timeout or at the
+                        deadline of the total budget, whichever is earlier
+
+        Output      :   A budget for the model family is returned
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        family_budget = Tuning_Budget(timeout, self.cancel_file)
+
+        if self.deadline is not None and (
+            family_budget.deadline is None or self.deadline < family_budget.deadline
+        ):
+            family_budget.deadline = self.deadline
+
+        return family_budget
+
+    def is_exhausted(self):
+        """
+        Method Name :   is_exhausted
+        Description :   This method checks whether the deadline of the budget has passed
+
+        Output      :   True if the deadline has passed, else False
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        return self.deadline is not None and time() > self.deadline
+
+    def is_cancelled(self):
+        """
+        Method Name :   is_cancelled
+        Description :   This method checks whether cancellation of the tuning is requested
+
+        Output      :   True if the cancel file exists, else False
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        return os.path.exists(self.cancel_file)
+
+    def check_cancelled(self):
+        """
+        Method Name :   check_cancelled
+        Description :   This method raises an exception when cancellation of the tuning is requested, so that the
+                        running search stops at its next checkpoint
+
+        Output      :   An exception is raised if the tuning is cancelled
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        if self.is_cancelled():
+            raise Exception("Tuning was cancelled")
+
+    def request_cancel(self):
+        """
+        Method Name :   request_cancel
+        Description :   This method requests cancellation of the running tuning by creating the cancel file
+
+        Output      :   The cancel file is created
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        with open(self.cancel_file, "w"):
+            pass
+
+    def clear_cancel(self):
+        """
+        Method Name :   clear_cancel
+        Description :   This method clears a previous cancellation request by removing the cancel file
+
+        Output      :   The cancel file is removed
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        if self.is_cancelled():
+            os.remove(self.cancel_file)
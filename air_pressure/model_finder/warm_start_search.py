@@ -0,0 +1,239 @@
+from time import perf_counter
+
+import numpy as np
+from joblib import Parallel, delayed
+from scipy.stats import rankdata
+from sklearn.base import clone
+from sklearn.model_selection import ParameterGrid, check_cv
+from sklearn.utils import _safe_indexing
+
+from utils.logger import App_Logger
+from utils.read_params import get_log_dic
+
+
+class Warm_Start_Search:
+    """
+    Description :   This class shall be used for tuning forest models by growing one forest per param combination
+                    and fold using warm_start, where the forest is scored at each n_estimators checkpoint instead of
+                    refitting the forest from scratch. It follows the interface of sklearn search engines
+    Version     :   1.2
+    Revisions   :   moved setup to cloud
+    """
+
+    def __init__(
+        self,
+        estimator,
+        param_grid,
+        log_file,
+        cv=5,
+        n_jobs=None,
+        verbose=0,
+        oob_score=False,
+        random_state=None,
+        budget=None,
+        chunk_size=16,
+    ):
+        self.estimator = estimator
+
+        self.param_grid = param_grid
+
+        self.log_file = log_file
+
+        self.cv = cv
+
+        self.n_jobs = n_jobs
+
+        self.verbose = verbose
+
+        self.oob_score = oob_score
+
+        self.random_state = random_state
+
+        self.budget = budget
+
+        self.chunk_size = chunk_size
+
+        self.log_writer = App_Logger()
+
+    def fit(self, X, y, sample_weight=None):
+        """
+        Method Name :   fit
+        Description :   This method grows the forests for chunks of param combinations and folds in parallel, until
+                        all the combinations are done or the budget runs out, and refits the best params on the whole
+                        data. When oob_score is set, out of bag score of a single forest is used in place of k fold
+
+        Output      :   The search engine with best_params_, best_score_, best_estimator_ and cv_results_ is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.fit.__name__, __file__, self.log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            checkpoints = sorted(self.param_grid["n_estimators"])
+
+            combos = list(
+                ParameterGrid(
+                    {k: v for k, v in self.param_grid.items() if k != "n_estimators"}
+                )
+            )
+
+            estimator = clone(self.estimator)
+
+            if estimator.get_params()["random_state"] is None:
+                estimator.set_params(random_state=self.random_state)
+
+            if self.oob_score is True:
+                estimator.set_params(oob_score=True, bootstrap=True)
+
+                splits = [(np.arange(len(y)), None)]
+
+            else:
+                splits = list(check_cv(self.cv, y, classifier=True).split(X, y))
+
+            self.log_writer.log(
+                f"Growing {len(combos) * len(splits)} forests upto {checkpoints} as checkpoints",
+                **log_dic,
+            )
+
+            out = []
+
+            self.stopped_early_ = False
+
+            with Parallel(n_jobs=self.n_jobs, verbose=self.verbose) as parallel:
+                for i in range(0, len(combos), self.chunk_size):
+                    if self.budget is not None:
+                        self.budget.check_cancelled()
+
+                        if out and self.budget.is_exhausted():
+                            self.stopped_early_ = True
+
+                            self.log_writer.log(
+                                f"Budget is exhausted, stopped after growing forests for {len(out) // len(splits)} of {len(combos)} combinations",
+                                **log_dic,
+                            )
+
+                            break
+
+                    out += parallel(
+                        delayed(grow_forest)(
+                            estimator,
+                            combo,
+                            checkpoints,
+                            X,
+                            y,
+                            sample_weight,
+                            train,
+                            test,
+                        )
+                        for combo in combos[i : i + self.chunk_size]
+                        for train, test in splits
+                    )
+
+            combos = combos[: len(out) // len(splits)]
+
+            scores = np.array([o[0] for o in out]).reshape(
+                len(combos), len(splits), len(checkpoints)
+            )
+
+            fit_times = np.array([o[1] for o in out]).reshape(
+                len(combos), len(splits), len(checkpoints)
+            )
+
+            params = [
+                dict(combo, n_estimators=n) for combo in combos for n in checkpoints
+            ]
+
+            mean_test_score = scores.mean(axis=1).ravel()
+
+            self.cv_results_ = {
+                "params": params,
+                "mean_test_score": mean_test_score,
+                "std_test_score": scores.std(axis=1).ravel(),
+                "mean_fit_time": fit_times.mean(axis=1).ravel(),
+                "rank_test_score": rankdata(-mean_test_score, method="min").astype(
+                    np.int32
+                ),
+            }
+
+            best_idx = int(np.argmax(mean_test_score))
+
+            self.best_params_ = params[best_idx]
+
+            self.best_score_ = mean_test_score[best_idx]
+
+            self.log_writer.log(
+                f"Got {self.best_params_} as best params with score as {self.best_score_}",
+                **log_dic,
+            )
+
+            self.best_estimator_ = clone(self.estimator)
+
+            if self.best_estimator_.get_params()["random_state"] is None:
+                self.best_estimator_.set_params(random_state=self.random_state)
+
+            self.best_estimator_.set_params(**self.best_params_)
+
+            fit_params = (
+                {} if sample_weight is None else {"sample_weight": sample_weight}
+            )
+
+            self.best_estimator_.fit(X, y, **fit_params)
+
+            self.log_writer.log("Refitted the best params on the whole data", **log_dic)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return self
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+
+def grow_forest(estimator, params, checkpoints, X, y, sample_weight, train, test):
+    """
+    Method Name :   grow_forest
+    Description :   This method grows a single forest with warm_start on the train indices and scores it at each
+                    checkpoint on the test indices, or with out of bag score when test indices are None
+
+    Output      :   A tuple of scores and cumulative fit times at each checkpoint is returned
+    On Failure  :   Raise an exception
+
+    Version     :   1.2
+    Revisions   :   moved setup to cloud
+    """
+    forest = clone(estimator).set_params(warm_start=True, **params)
+
+    fit_params = (
+        {}
+        if sample_weight is None
+        else {"sample_weight": _safe_indexing(sample_weight, train)}
+    )
+
+    X_train, y_train = _safe_indexing(X, train), _safe_indexing(y, train)
+
+    scores, fit_times = [], []
+
+    start_time = perf_counter()
+
+    for n_estimators in checkpoints:
+        forest.set_params(n_estimators=n_estimators)
+
+        forest.fit(X_train, y_train, **fit_params)
+
+        fit_times.append(perf_counter() - start_time)
+
+        if test is None:
+            scores.append(forest.oob_score_)
+
+        else:
+            scores.append(
+                forest.score(_safe_indexing(X, test), _safe_indexing(y, test))
+            )
+
+    return scores, fit_times
@@ -1,12 +1,27 @@
 import json
 import os
+import threading
 
 import pandas as pd
-from pymongo import MongoClient
 
 from utils.logger import App_Logger
 from utils.read_params import get_log_dic, read_params
 
+_mongo_clients_lock = threading.Lock()
+
+_mongo_clients = {}
+
+
+def _reset_after_fork():
+    global _mongo_clients_lock, _mongo_clients
+
+    _mongo_clients_lock = threading.Lock()
+
+    _mongo_clients = {}
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
 
 class MongoDB_Operation:
     """
@@ -22,10 +37,30 @@ class MongoDB_Operation:
 
         self.DB_URL = os.environ["MONGODB_URL"]
 
-        self.client = MongoClient(self.DB_URL)
-
         self.log_writer = App_Logger()
 
+    def get_client(self):
+        """
+        Method Name :   get_client
+        Description :   This method gets the mongodb client for the db url, pymongo is imported and the client is
+                        created on the first call in the process and reused by the later calls, so that importing
+                        and constructing the class does not connect to mongodb. The client is created again in a
+                        forked child
+
+        Output      :   The mongodb client is returned
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        with _mongo_clients_lock:
+            if self.DB_URL not in _mongo_clients:
+                from pymongo import MongoClient
+
+                _mongo_clients[self.DB_URL] = MongoClient(self.DB_URL)
+
+            return _mongo_clients[self.DB_URL]
+
     def get_database(self, db_name, log_file):
         """
         Method Name :   get_database
@@ -44,7 +79,7 @@ class MongoDB_Operation:
         self.log_writer.start_log("start", **log_dic)
 
         try:
-            db = self.client[db_name]
+            db = self.get_client()[db_name]
 
             self.log_writer.log(f"Created {db_name} database in MongoDB", **log_dic)
 
@@ -119,7 +154,7 @@ class MongoDB_Operation:
 
             self.log_writer.log("Converted collection to dataframe", **log_dic)
 
-            self.log_writer.start_log("exit", *log_dic)
+            self.log_writer.start_log("exit", **log_dic)
 
             return df
 
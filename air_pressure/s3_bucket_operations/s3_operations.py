@@ -1,15 +1,31 @@
 import json
 import os
 import pickle
+import threading
+from hashlib import sha256
 from io import StringIO
 
-import boto3
 import pandas as pd
 from botocore.exceptions import ClientError
 
 from utils.logger import App_Logger
 from utils.read_params import get_log_dic, read_params
 
+_s3_client_lock = threading.Lock()
+
+_s3_client = None
+
+
+def _reset_after_fork():
+    global _s3_client_lock, _s3_client
+
+    _s3_client_lock = threading.Lock()
+
+    _s3_client = None
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
 
 class S3_Operation:
     """
@@ -27,9 +43,50 @@ class S3_Operation:
 
         self.file_format = self.config["save_format"]
 
-        self.s3_client = boto3.client("s3")
+        self.s3_local = threading.local()
+
+    def get_s3_client(self):
+        """
+        Method Name :   get_s3_client
+        Description :   This method gets the s3 client, boto3 is imported and the client is created on the first
+                        call in the process and reused by the later calls, so that importing and constructing the
+                        class stays cheap. The client is created again in a forked child
+
+        Output      :   The s3 client is returned
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        global _s3_client
+
+        with _s3_client_lock:
+            if _s3_client is None:
+                import boto3
 
-        self.s3_resource = boto3.resource("s3")
+                _s3_client = boto3.client("s3")
+
+            return _s3_client
+
+    def get_s3_resource(self):
+        """
+        Method Name :   get_s3_resource
+        Description :   This method gets the s3 resource of the object for the current thread, the resource is
+                        created on the first call in the thread from its own boto3 session. boto3 resources and the
+                        default session are not thread safe, so the resource is not shared between threads
+
+        Output      :   The s3 resource is returned
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        if getattr(self.s3_local, "s3_resource", None) is None:
+            import boto3
+
+            self.s3_local.s3_resource = boto3.session.Session().resource("s3")
+
+        return self.s3_local.s3_resource
 
     def read_object(self, object, log_file, decode=True, make_readable=False):
         """
@@ -261,7 +318,7 @@ class S3_Operation:
         self.log_writer.start_log("start", **log_dic)
 
         try:
-            self.s3_resource.Object(bucket, folder_name).load()
+            self.get_s3_resource().Object(bucket, folder_name).load()
 
             self.log_writer.log(f"Folder {folder_name} already exists.", **log_dic)
 
@@ -275,7 +332,7 @@ class S3_Operation:
 
                 folder_obj = folder_name + "/"
 
-                self.s3_client.put_object(Bucket=bucket, Key=folder_obj)
+                self.get_s3_client().put_object(Bucket=bucket, Key=folder_obj)
 
                 self.log_writer.log(
                     f"{folder_name} folder created in {bucket} bucket", **log_dic
@@ -306,7 +363,7 @@ class S3_Operation:
         self.log_writer.start_log("start", **log_dic)
 
         try:
-            self.s3_client.put_object(bucket, (object + "/"))
+            self.get_s3_client().put_object(bucket, (object + "/"))
 
             self.log_writer.log(
                 f"Created {object} folder in {bucket} bucket", **log_dic
@@ -339,7 +396,7 @@ class S3_Operation:
                 f"Uploading {from_fname} to s3 bucket {bucket}", **log_dic
             )
 
-            self.s3_resource.meta.client.upload_file(from_fname, bucket, to_fname)
+            self.get_s3_resource().meta.client.upload_file(from_fname, bucket, to_fname)
 
             self.log_writer.log(
                 f"Uploaded {from_fname} to s3 bucket {bucket}", **log_dic
@@ -366,6 +423,36 @@ class S3_Operation:
         except Exception as e:
             self.log_writer.exception_log(e, **log_dic)
 
+    def download_file(self, from_fname, bucket, to_fname, log_file):
+        """
+        Method Name :   download_file
+        Description :   This method downloads a file from s3 bucket to a local file
+
+        Output      :   A file is downloaded from s3 bucket
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.download_file.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            self.get_s3_client().download_file(bucket, from_fname, to_fname)
+
+            self.log_writer.log(
+                f"Downloaded {from_fname} from s3 bucket {bucket} to {to_fname}",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
     def get_bucket(self, bucket, log_file):
         """
         Method Name :   get_bucket
@@ -384,7 +471,7 @@ class S3_Operation:
         self.log_writer.start_log("start", **log_dic)
 
         try:
-            bucket = self.s3_resource.Bucket(bucket)
+            bucket = self.get_s3_resource().Bucket(bucket)
 
             self.log_writer.log(f"Got {bucket} bucket", **log_dic)
 
@@ -415,7 +502,7 @@ class S3_Operation:
         try:
             copy_source = {"Bucket": from_bucket, "Key": from_fname}
 
-            self.s3_resource.meta.client.copy(copy_source, to_bucket, to_fname)
+            self.get_s3_resource().meta.client.copy(copy_source, to_bucket, to_fname)
 
             self.log_writer.log(
                 f"Copied data from bucket {from_bucket} to bucket {to_bucket}",
@@ -445,7 +532,7 @@ class S3_Operation:
         self.log_writer.start_log("start", **log_dic)
 
         try:
-            self.s3_resource.Object(bucket, fname).delete()
+            self.get_s3_resource().Object(bucket, fname).delete()
 
             self.log_writer.log(f"Deleted {fname} from bucket {bucket}", **log_dic)
 
@@ -600,12 +687,109 @@ class S3_Operation:
         except Exception as e:
             self.log_writer.exception_log(e, **log_dic)
 
-    def save_model(self, model, model_dir, model_bucket, log_file, idx=None):
+    def get_object_etags(self, prefix, bucket, log_file):
+        """
+        Method Name :   get_object_etags
+        Description :   This method lists the objects under the prefix in s3 bucket with the shared s3 client, which
+                        is thread safe, so that it can be called from any thread
+
+        Output      :   A dict of object key to etag is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.get_object_etags.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            paginator = self.get_s3_client().get_paginator("list_objects_v2")
+
+            object_etags = {
+                obj["Key"]: obj["ETag"]
+                for page in paginator.paginate(Bucket=bucket, Prefix=prefix)
+                for obj in page.get("Contents", [])
+            }
+
+            self.log_writer.log(
+                f"Got {len(object_etags)} objects under {prefix} from bucket {bucket}",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return object_etags
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_object_metadata(self, fname, bucket, log_file):
+        """
+        Method Name :   get_object_metadata
+        Description :   This method gets the user metadata of an object in s3 bucket with a head request
+
+        Output      :   A dict of metadata is returned, None is returned if the object does not exist
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.get_object_metadata.__name__,
+            __file__,
+            log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            try:
+                metadata = self.get_s3_client().head_object(Bucket=bucket, Key=fname)[
+                    "Metadata"
+                ]
+
+            except ClientError as e:
+                if e.response["Error"]["Code"] not in ("404", "NoSuchKey"):
+                    raise
+
+                metadata = None
+
+            self.log_writer.log(
+                f"Got metadata of {fname} from bucket {bucket} as {metadata}", **log_dic
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return metadata
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def save_model(
+        self,
+        model,
+        model_dir,
+        model_bucket,
+        log_file,
+        idx=None,
+        model_bytes=None,
+        model_name=None,
+        file_format=None,
+        extra_metadata=None,
+    ):
         """
         Method Name :   save_model
-        Description :   This method saves the model into particular model directory in s3 bucket with kwargs
+        Description :   This method saves the model into particular model directory in s3 bucket with kwargs. The model
+                        is pickled unless its serialized bytes are given, and the bytes are put with their sha256
+                        as metadata. The upload is skipped when the object in s3 bucket has the same sha256.
+                        The model is saved with its class name unless model_name is given, and with save_format
+                        unless file_format is given. extra_metadata is put with the sha256
 
-        Output      :   A pandas series object consisting of runs for the particular experiment id
+        Output      :   The sha256 of the model bytes is returned
         On Failure  :   Write an exception log and then raise an exception
 
         Version     :   1.2
@@ -618,33 +802,57 @@ class S3_Operation:
         self.log_writer.start_log("start", **log_dic)
 
         try:
-            model_name = model.__class__.__name__
+            if model_name is None:
+                model_name = model.__class__.__name__
+
+            if file_format is None:
+                file_format = self.file_format
 
-            model_file = model_name + self.file_format
+            model_file = model_name + file_format
 
-            with open(file=model_file, mode="wb") as f:
-                pickle.dump(model, f)
+            if model_bytes is None:
+                model_bytes = pickle.dumps(model)
+
+            model_sha256 = sha256(model_bytes).hexdigest()
 
             self.log_writer.log(
-                f"Saved {model_name} model as {model_file} name", **log_dic
+                f"Got {model_sha256} as sha256 of {model_name} model", **log_dic
             )
 
+            model_metadata = {**(extra_metadata or {}), "sha256": model_sha256}
+
             bucket_model_path = model_dir + "/" + model_file
 
-            self.log_writer.log(
-                f"Uploading {model_file} to {model_bucket} bucket", **log_dic
+            metadata = self.get_object_metadata(
+                bucket_model_path, model_bucket, log_file
             )
 
-            self.upload_file(
-                model_file, bucket_model_path, model_bucket, log_file,
-            )
+            if metadata == model_metadata:
+                self.log_writer.log(
+                    f"{model_file} with same sha256 is present in {model_bucket} bucket, skipped upload",
+                    **log_dic,
+                )
 
-            self.log_writer.log(
-                f"Uploaded  {model_file} to {model_bucket} bucket", **log_dic
-            )
+            else:
+                self.log_writer.log(
+                    f"Uploading {model_file} to {model_bucket} bucket", **log_dic
+                )
+
+                self.get_s3_client().put_object(
+                    Bucket=model_bucket,
+                    Key=bucket_model_path,
+                    Body=model_bytes,
+                    Metadata=model_metadata,
+                )
+
+                self.log_writer.log(
+                    f"Uploaded  {model_file} to {model_bucket} bucket", **log_dic
+                )
 
             self.log_writer.start_log("exit", **log_dic)
 
+            return model_sha256
+
         except Exception as e:
             self.log_writer.log(
                 f"Model file {model_name} could not be saved", **log_dic
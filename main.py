@@ -1,18 +1,19 @@
 import json
+from typing import Any, Dict, List
 
 import uvicorn
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response
+from fastapi.responses import JSONResponse, Response
 from fastapi.templating import Jinja2Templates
-
-from air_pressure.model.load_production_model import Load_Prod_Model
-from air_pressure.model.prediction_from_model import Prediction
-from air_pressure.model.training_model import Train_Model
-from air_pressure.validation_insertion.prediction_validation_insertion import \
-    Pred_Validation
-from air_pressure.validation_insertion.train_validation_insertion import \
-    Train_Validation
+from pydantic import BaseModel
+
+from air_pressure.mlflow_utils.mlflow_spool import MLFlow_Spool
+from air_pressure.model.micro_batcher import Micro_Batcher
+from air_pressure.model.online_prediction import Online_Prediction
+from air_pressure.model.warm_up import Warm_Up
+from air_pressure.model_finder.tuning_budget import Tuning_Budget
+from utils.prefork_server import Prefork_Server
 from utils.read_params import read_params
 
 app = FastAPI()
@@ -21,6 +22,12 @@ config = read_params()
 
 templates = Jinja2Templates(directory=config["templates"]["dir"])
 
+online_prediction = Online_Prediction()
+
+micro_batcher = Micro_Batcher(online_prediction)
+
+warm_up = Warm_Up(online_prediction)
+
 origins = ["*"]
 
 app.add_middleware(
@@ -32,6 +39,34 @@ app.add_middleware(
 )
 
 
+@app.on_event("startup")
+def startMLFlowSpool():
+    mlflow_spool = MLFlow_Spool()
+
+    if mlflow_spool.enabled:
+        mlflow_spool.start_worker(mlflow_spool.spool_log)
+
+
+@app.on_event("startup")
+def startWarmUp():
+    warm_up.start()
+
+
+def preloadApp():
+    try:
+        warm_up.warm_up()
+
+    except Exception:
+        pass
+
+
+@app.get("/ready")
+def readyRouteClient():
+    status = warm_up.get_status()
+
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+
 @app.get("/")
 async def index(request: Request):
     return templates.TemplateResponse(
@@ -40,19 +75,47 @@ async def index(request: Request):
 
 
 @app.get("/train")
-async def trainRouteClient():
+def trainRouteClient():
     try:
+        from air_pressure.model.load_production_model import Load_Prod_Model
+        from air_pressure.model.training_model import Train_Model
+        from air_pressure.validation_insertion.train_validation_insertion import \
+            Train_Validation
+
+        Tuning_Budget(None, config["model_utils"]["budget"]["cancel_file"]).clear_cancel()
+
         train_val = Train_Validation()
 
         train_val.training_validation()
 
         train_model = Train_Model()
 
-        model_score_lst = train_model.training_model()
+        model_score_lst, train_id = train_model.training_model()
+
+        mlflow_spool = MLFlow_Spool()
 
         load_prod_model = Load_Prod_Model()
 
-        load_prod_model.load_production_model(model_score_lst)
+        if mlflow_spool.enabled:
+            snapshot_dir = load_prod_model.snapshot_trained_models(
+                model_score_lst, train_id
+            )
+
+            mlflow_spool.put_job(
+                "promote",
+                {
+                    "model_score_lst": model_score_lst,
+                    "train_id": train_id,
+                    "snapshot_dir": snapshot_dir,
+                },
+                mlflow_spool.spool_log,
+            )
+
+            return Response(
+                "Training successfull!! Models will be logged to mlflow and promoted in the background"
+            )
+
+        load_prod_model.load_production_model(model_score_lst, train_id)
 
         return Response("Training successfull!!")
 
@@ -60,9 +123,28 @@ async def trainRouteClient():
         return Response(f"Error Occurred! {e}")
 
 
+@app.get("/train/cancel")
+async def trainCancelRouteClient():
+    try:
+        tuning_budget = Tuning_Budget(
+            None, config["model_utils"]["budget"]["cancel_file"]
+        )
+
+        tuning_budget.request_cancel()
+
+        return Response("Cancellation of training requested!!")
+
+    except Exception as e:
+        return Response(f"Error Occurred! {e}")
+
+
 @app.get("/predict")
-async def predictRouteClient():
+def predictRouteClient():
     try:
+        from air_pressure.model.prediction_from_model import Prediction
+        from air_pressure.validation_insertion.prediction_validation_insertion import \
+            Pred_Validation
+
         pred_val = Pred_Validation()
 
         pred_val.prediction_validation()
@@ -79,9 +161,43 @@ async def predictRouteClient():
         return Response(f"Error Occurred! {e}")
 
 
+class Online_Records(BaseModel):
+    records: List[Dict[str, Any]]
+
+
+@app.post("/predict/online")
+async def predictOnlineRouteClient(online_records: Online_Records):
+    try:
+        data = await micro_batcher.validate(online_records.records)
+
+    except Exception as e:
+        return JSONResponse({"error": f"Invalid records! {e}"}, status_code=400)
+
+    try:
+        predictions = await micro_batcher.predict(data)
+
+        return JSONResponse({"predictions": predictions})
+
+    except Exception as e:
+        status_code = 503 if warm_up.get_status()["ready"] is False else 500
+
+        return JSONResponse({"error": f"Error Occurred! {e}"}, status_code=status_code)
+
+
+@app.get("/predict/online/stats")
+def predictOnlineStatsRouteClient():
+    return JSONResponse(micro_batcher.get_stats())
+
+
 if __name__ == "__main__":
     host = config["app"]["host"]
 
     port = config["app"]["port"]
 
-    uvicorn.run(app, host=host, port=port)
+    if config["app"]["workers"] > 1:
+        prefork_server = Prefork_Server(app)
+
+        prefork_server.run(preloadApp)
+
+    else:
+        uvicorn.run(app, host=host, port=port)
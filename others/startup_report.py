@@ -0,0 +1,113 @@
+"""
+Startup report for the imports of the app.
+
+Imports main in a fresh interpreter with `python -X importtime`, and prints the wall time of the import, the modules
+with the largest cumulative and self import time, and the heavy modules of the training stack (mlflow, imblearn,
+pymongo, boto3 and the like) which were imported. The prediction role should not import any of them at startup, they
+are imported by the routes which need them. The report fails when the import takes more than --max-seconds or when
+a module given with --forbid was imported.
+
+Usage : python others/startup_report.py --top 20 --max-seconds 1.0
+"""
+import argparse
+import os
+import subprocess
+import sys
+from time import perf_counter
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = [
+    "mlflow",
+    "imblearn",
+    "pymongo",
+    "boto3",
+    "sklearn.model_selection",
+    "sklearn.ensemble",
+    "scipy.stats",
+]
+
+
+def get_import_times(module):
+    start = perf_counter()
+
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT_DIR,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+
+    wall_time = perf_counter() - start
+
+    if proc.returncode != 0:
+        raise Exception(f"Importing {module} failed\n{proc.stderr}")
+
+    import_times = []
+
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+
+        import_times.append(
+            (name.strip(), int(self_us) / 1e6, int(cumulative_us) / 1e6)
+        )
+
+    return wall_time, import_times
+
+
+def print_top(title, import_times, key, top):
+    print(f"\n{title}")
+
+    print(f"{'module':<60}{'self s':>10}{'cumulative s':>14}")
+
+    for name, self_s, cumulative_s in sorted(import_times, key=key, reverse=True)[:top]:
+        print(f"{name:<60}{self_s:>10.3f}{cumulative_s:>14.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("--module", default="main")
+
+    parser.add_argument("--top", type=int, default=20)
+
+    parser.add_argument("--max-seconds", type=float, default=None)
+
+    parser.add_argument("--forbid", nargs="*", default=HEAVY_MODULES)
+
+    args = parser.parse_args()
+
+    wall_time, import_times = get_import_times(args.module)
+
+    print(f"Imported {args.module} in {wall_time:.3f} seconds of wall time")
+
+    print(f"{len(import_times)} modules were imported")
+
+    print_top(
+        "Top modules by cumulative import time", import_times, lambda t: t[2], args.top
+    )
+
+    print_top("Top modules by self import time", import_times, lambda t: t[1], args.top)
+
+    imported = {name for name, _, _ in import_times}
+
+    forbidden = [name for name in args.forbid if name in imported]
+
+    print(f"\nHeavy modules imported at startup : {forbidden if forbidden else 'none'}")
+
+    if len(forbidden) > 0:
+        raise Exception(f"{forbidden} were imported by {args.module}")
+
+    if args.max_seconds is not None and wall_time > args.max_seconds:
+        raise Exception(
+            f"Importing {args.module} took {wall_time:.3f} seconds, more than {args.max_seconds} seconds"
+        )
+
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Smoke test for the memory of the prefork workers.
+
+Starts the app with `python main.py` (set app.workers in params.yaml to more than 1), or uses a running
+server given with --pid, sends concurrent requests to /predict/online, and then reads /proc/<pid>/smaps_rollup
+of the parent and of every worker. Pages which a worker shares with the parent are counted in Shared_*, so the
+memory an extra worker costs is its Private_Clean + Private_Dirty. The test fails when any worker has more
+private memory than --max-private-mb.
+
+Usage : python others/worker_rss_smoke.py --requests 200 --max-private-mb 150
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from time import sleep
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.read_params import read_params
+
+
+def get_memory(pid):
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        fields = dict(line.split(":", 1) for line in f if line.endswith("kB\n"))
+
+    mem = {key: int(value.split()[0]) / 1024 for key, value in fields.items()}
+
+    mem["Private"] = mem["Private_Clean"] + mem["Private_Dirty"]
+
+    return mem
+
+
+def get_workers(parent_pid):
+    workers = []
+
+    for pid in filter(str.isdigit, os.listdir("/proc")):
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+
+        except (OSError, IndexError, ValueError):
+            continue
+
+        if ppid == parent_pid:
+            workers.append(int(pid))
+
+    return sorted(workers)
+
+
+def wait_for_app(url, timeout):
+    for _ in range(timeout):
+        try:
+            if requests.get(url + "/predict/online/stats", timeout=1).ok:
+                return
+
+        except requests.RequestException:
+            pass
+
+        sleep(1)
+
+    raise Exception(f"App at {url} did not start in {timeout} seconds")
+
+
+def main():
+    config = read_params()
+
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("--url", default=f"http://127.0.0.1:{config['app']['port']}")
+
+    parser.add_argument("--pid", type=int, default=None)
+
+    parser.add_argument("--requests", type=int, default=200)
+
+    parser.add_argument("--max-private-mb", type=float, default=150.0)
+
+    parser.add_argument("--timeout", type=int, default=300)
+
+    args = parser.parse_args()
+
+    server = None
+
+    if args.pid is None:
+        server = subprocess.Popen([sys.executable, "main.py"])
+
+        args.pid = server.pid
+
+    try:
+        wait_for_app(args.url, args.timeout)
+
+        with open(config["schema_file"]["pred_schema_file"]) as f:
+            record = {col: 0.0 for col in json.load(f)["ColName"]}
+
+        with ThreadPoolExecutor(max_workers=32) as executor:
+            status_codes = list(
+                executor.map(
+                    lambda _: requests.post(
+                        args.url + "/predict/online", json={"records": [record]}
+                    ).status_code,
+                    range(args.requests),
+                )
+            )
+
+        print(f"Sent {args.requests} requests, {status_codes.count(200)} returned 200")
+
+        workers = get_workers(args.pid)
+
+        print(f"{'process':<16}{'rss mb':>10}{'pss mb':>10}{'private mb':>12}")
+
+        for name, pid in [("parent", args.pid)] + [
+            (f"worker {pid}", pid) for pid in workers
+        ]:
+            mem = get_memory(pid)
+
+            print(
+                f"{name:<16}{mem['Rss']:>10.1f}{mem['Pss']:>10.1f}{mem['Private']:>12.1f}"
+            )
+
+        worker_private = [get_memory(pid)["Private"] for pid in workers]
+
+        if len(workers) == 0 or status_codes.count(200) == 0:
+            raise Exception("No worker served the requests")
+
+        if max(worker_private) > args.max_private_mb:
+            raise Exception(
+                f"Worker private memory {max(worker_private):.1f} MB is more than {args.max_private_mb} MB"
+            )
+
+        print(
+            f"OK, {len(workers)} workers with at most {max(worker_private):.1f} MB of private memory each"
+        )
+
+    finally:
+        if server is not None:
+            server.terminate()
+
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
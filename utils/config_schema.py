@@ -0,0 +1,202 @@
+from typing import Dict
+
+from pydantic import BaseModel, confloat, conint
+from typing_extensions import Literal
+
+
+class Config_Section(BaseModel):
+    """
+    Description :   This class shall be used as the base of the sections of the params schema, the keys which are
+                    not in the schema are allowed, so that a new param does not need a schema change
+    Version     :   1.2
+    Revisions   :   moved setup to cloud
+    """
+
+    class Config:
+        extra = "allow"
+
+
+class Base_Params(Config_Section):
+    random_state: int
+
+    test_size: confloat(gt=0, lt=1)
+
+
+class App_Params(Config_Section):
+    host: str
+
+    port: conint(gt=0, lt=65536)
+
+    workers: conint(ge=1)
+
+
+class Warm_Up_Params(Config_Section):
+    retry_interval: confloat(gt=0)
+
+
+class Prod_Model_Cache_Params(Config_Section):
+    ttl: confloat(ge=0)
+
+    local_dir: str
+
+
+class Model_Artifact_Params(Config_Section):
+    alignment: conint(gt=0)
+
+    min_buffer_bytes: conint(ge=0)
+
+
+class Batching_Params(Config_Section):
+    enabled: bool
+
+    max_wait_ms: confloat(ge=0)
+
+    max_rows: conint(gt=0)
+
+    stats_window: conint(gt=0)
+
+
+class Online_Prediction_Params(Config_Section):
+    max_records: conint(gt=0)
+
+    batching: Batching_Params
+
+
+class Imbalance_Params(Config_Section):
+    strategy: Literal["smote", "undersample", "class_weight"]
+
+
+class Search_Params(Config_Section):
+    strategy: Literal["grid", "random", "halving", "warm_start", "bayes"]
+
+
+class Model_Utils_Params(Config_Section):
+    cv: conint(ge=2)
+
+    n_jobs: int
+
+    search: Search_Params
+
+
+class Tuning_Cache_Params(Config_Section):
+    enabled: bool
+
+    backend: Literal["local", "s3"]
+
+    dir: str
+
+
+class Tree_Engine_Params(Config_Section):
+    enabled: bool
+
+    save_format: str
+
+
+class Spool_Params(Config_Section):
+    enabled: bool
+
+    dir: str
+
+    poll_interval: confloat(gt=0)
+
+    backoff: confloat(gt=0)
+
+    max_backoff: confloat(gt=0)
+
+    max_attempts: conint(gt=0)
+
+    dead_letter_dir: str
+
+
+class MLFlow_Params(Config_Section):
+    experiment_name: str
+
+    run_name: str
+
+    spool: Spool_Params
+
+
+class Log_Params(Config_Section):
+    filemode: str
+
+    format: str
+
+    datefmt: str
+
+    level: Literal["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
+
+
+class Params_Schema(Config_Section):
+    """
+    Description :   This class shall be used for validating the params read from params.yaml, the sections which are
+                    used by the app at startup and on the hot path are typed, the rest of the params are allowed as
+                    they are
+    Version     :   1.2
+    Revisions   :   moved setup to cloud
+    """
+
+    base: Base_Params
+
+    target_col: str
+
+    app: App_Params
+
+    dir: Dict[str, str]
+
+    log: Dict[str, str]
+
+    log_params: Log_Params
+
+    s3_bucket: Dict[str, str]
+
+    model_dir: Dict[str, str]
+
+    save_format: str
+
+    preprocessing_pipeline: str
+
+    warm_up: Warm_Up_Params
+
+    prod_model_cache: Prod_Model_Cache_Params
+
+    model_artifact: Model_Artifact_Params
+
+    online_prediction: Online_Prediction_Params
+
+    imbalance: Imbalance_Params
+
+    model_utils: Model_Utils_Params
+
+    tuning_cache: Tuning_Cache_Params
+
+    tree_engine: Tree_Engine_Params
+
+    mlflow_config: MLFlow_Params
+
+    schema_file: Dict[str, str]
+
+    templates: Dict[str, str]
+
+    model_registry: Dict[str, Dict]
+
+    search_space: Dict[str, Dict[str, Dict]]
+
+    export_csv_file: Dict[str, str]
+
+    knn_imputer: Dict
+
+    pca_model: Dict
+
+    kmeans_cluster: Dict
+
+    mongodb: Dict[str, str]
+
+    data: Dict[str, Dict[str, str]]
+
+    regex_file: str
+
+    pred_output_file: str
+
+    null_values_csv_file: str
+
+    elbow_plot_fig: str
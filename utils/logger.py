@@ -1,13 +1,161 @@
-from datetime import datetime
-from logging import basicConfig, error, info, shutdown
-from os import makedirs
+import atexit
+import os
+import threading
+from logging import DEBUG, ERROR, INFO, FileHandler, Formatter, Handler, getLogger
+from logging.handlers import QueueHandler, QueueListener
+from multiprocessing.util import Finalize
 from os.path import basename, join, split
+from queue import SimpleQueue
 from sys import exc_info
+from time import localtime, strftime
 
 from utils.read_params import read_params
 
+_log_lock = threading.Lock()
+
+_log_listener = None
+
+_logger = getLogger("air_pressure")
+
+_logger.propagate = False
+
+
+def _stop_listener():
+    global _log_listener
+
+    with _log_lock:
+        if _log_listener is not None:
+            _log_listener.stop()
+
+            for handler in _log_listener.handlers:
+                handler.close()
+
+            _log_listener = None
+
+        for handler in list(_logger.handlers):
+            _logger.removeHandler(handler)
+
+
+def _reset_after_fork():
+    global _log_lock, _log_listener
+
+    _log_lock = threading.Lock()
+
+    _log_listener = None
+
+    for handler in list(_logger.handlers):
+        _logger.removeHandler(handler)
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+atexit.register(_stop_listener)
+
+
+class Log_Queue_Handler(QueueHandler):
+    """
+    Description :   This class shall be used for putting the log records on the log queue, only the message is merged
+                    with its args on the calling thread, since the caller may change the args after the call. The
+                    rest of the formatting is done by the writer thread, so that logging on the request thread is
+                    a queue append
+    Version     :   1.2
+    Revisions   :   moved setup to cloud
+    """
+
+    def prepare(self, record):
+        if record.args:
+            record.msg = record.getMessage()
+
+            record.args = None
+
+        return record
+
+
+class Log_File_Handler(Handler):
+    """
+    Description :   This class shall be used by the writer thread for writing the log records to their log files, a
+                    file handler is opened once per log file and day and is reused by the later records. The file
+                    handlers of the day before are closed when the day changes
+    Version     :   1.2
+    Revisions   :   moved setup to cloud
+    """
+
+    def __init__(self, log_dir, log_params):
+        super().__init__()
+
+        self.log_dir = log_dir
+
+        self.log_params = log_params
+
+        self.formatter = Formatter(
+            fmt=self.log_params["format"], datefmt=self.log_params["datefmt"]
+        )
+
+        self.current_date = None
+
+        self.file_handlers = {}
+
+    def get_file_handler(self, record):
+        """
+        Method Name :   get_file_handler
+        Description :   This method gets the file handler of the log file of the record, the log file is named with
+                        the date of the record
+
+        Output      :   The file handler of the log file is returned
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        record_date = strftime("%Y-%m-%d", localtime(record.created))
+
+        if record_date != self.current_date:
+            for file_handler in self.file_handlers.values():
+                file_handler.close()
+
+            self.file_handlers = {}
+
+            self.current_date = record_date
+
+        if record.log_file not in self.file_handlers:
+            os.makedirs(self.log_dir, exist_ok=True)
+
+            file_handler = FileHandler(
+                join(self.log_dir, record_date + "-" + record.log_file),
+                mode=self.log_params["filemode"],
+            )
+
+            file_handler.setFormatter(self.formatter)
+
+            self.file_handlers[record.log_file] = file_handler
+
+        return self.file_handlers[record.log_file]
+
+    def emit(self, record):
+        try:
+            self.get_file_handler(record).handle(record)
+
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        for file_handler in self.file_handlers.values():
+            file_handler.close()
+
+        self.file_handlers = {}
+
+        super().close()
+
 
 class App_Logger:
+    """
+    Description :   This class shall be used for writing the logs of the app. The log records are put on a queue and
+                    written to their log files by one background writer thread per process, the writer is started on
+                    the first log and the queue is drained when the process exits
+    Version     :   1.2
+    Revisions   :   moved setup to cloud
+    """
+
     def __init__(self):
         self.config = read_params()
 
@@ -15,63 +163,143 @@ class App_Logger:
 
         self.log_params = self.config["log_params"]
 
-        self.current_date = f"{datetime.now().strftime('%Y-%m-%d')}"
-
-    def get_log_file(self, log_file):
+    def get_logger(self):
         """
-        Method Name :   get_log_file
-        Description :   This method gets the log file with path from the log_file key
-        
-        Output      :   The log file with path is returned
-        On Failure  :   Raise an exception 
-        
+        Method Name :   get_logger
+        Description :   This method gets the logger of the app, the log queue and the writer thread are started on the
+                        first call in the process, and again in a forked child. The queue is drained at exit, also in
+                        the worker processes of multiprocessing which do not run atexit
+
+        Output      :   The logger of the app is returned
+        On Failure  :   Raise an exception
+
         Version     :   1.2
         Revisions   :   moved setup to cloud
         """
-        try:
-            makedirs(self.log_dir, exist_ok=True)
+        global _log_listener
 
-            log_f = self.current_date + "-" + log_file
+        if _log_listener is None:
+            with _log_lock:
+                if _log_listener is None:
+                    log_queue = SimpleQueue()
 
-            log_file = join(self.log_dir, log_f)
+                    _logger.setLevel(self.log_params["level"])
 
-            return log_file
+                    _logger.addHandler(Log_Queue_Handler(log_queue))
 
-        except Exception as e:
-            raise e
+                    listener = QueueListener(
+                        log_queue, Log_File_Handler(self.log_dir, self.log_params)
+                    )
+
+                    listener.start()
+
+                    _log_listener = listener
 
-    def log(self, log_message, class_name, method_name, file, log_file):
+                    Finalize(None, _stop_listener, exitpriority=0)
+
+        return _logger
+
+    def is_enabled(self, level):
+        """
+        Method Name :   is_enabled
+        Description :   This method checks if the records of the level are written, so that a caller can skip
+                        computing a log message which would not be written
+
+        Output      :   True is returned if the level is enabled, else False
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        return self.get_logger().isEnabledFor(level)
+
+    def write_log(
+        self, level, log_message, args, class_name, method_name, file, log_file
+    ):
+        """
+        Method Name :   write_log
+        Description :   This method puts the log record on the log queue with the class name, method name, file name
+                        and log file of the record. Nothing is done when the level is not enabled, and the message
+                        is merged with its %-style args only for an enabled level. The record is made with the file
+                        of the caller, so the stack is not walked to find the caller
+
+        Output      :   The log record is put on the log queue
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        logger = self.get_logger()
+
+        if logger.isEnabledFor(level):
+            logger.handle(
+                logger.makeRecord(
+                    logger.name,
+                    level,
+                    file,
+                    0,
+                    log_message,
+                    args or None,
+                    None,
+                    extra={
+                        "class_name": class_name,
+                        "method_name": method_name,
+                        "file_name": basename(file),
+                        "log_file": log_file,
+                    },
+                )
+            )
+
+    def log(
+        self, log_message, *args, class_name, method_name, file, log_file, level=INFO
+    ):
         """
         Method Name :   log
-        Description :   This method writes the log info using current date and time
-        
+        Description :   This method writes the log info using current date and time, the args are merged into the
+                        log message with %-style formatting only when the level is enabled, so that large objects
+                        like dataframes are passed as args instead of being formatted into the message
+
         Output      :   log information is written to file
         On Failure  :   Raise an exception
-        
+
         Version     :   1.2
         Revisions   :   moved setup to cloud
         """
         try:
-            log_file = self.get_log_file(log_file)
-
-            basicConfig(filename=log_file, **self.log_params)
-
-            info(
-                log_message,
-                extra={
-                    "class_name": class_name,
-                    "method_name": method_name,
-                    "file_name": basename(file),
-                },
+            self.write_log(
+                level, log_message, args, class_name, method_name, file, log_file
             )
 
         except Exception as e:
             raise e
 
+    def debug_log(self, log_message, *args, class_name, method_name, file, log_file):
+        """
+        Method Name :   debug_log
+        Description :   This method writes the log at debug level, which is written only when log_params.level is
+                        DEBUG
+
+        Output      :   log information is written to file
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        self.log(
+            log_message,
+            *args,
+            class_name=class_name,
+            method_name=method_name,
+            file=file,
+            log_file=log_file,
+            level=DEBUG,
+        )
+
     def start_log(self, key, class_name, method_name, file, log_file):
         """
         Method Name :   start_log
-        Description :   This method creates an entry point log in log file
+        Description :   This method creates an entry point log in log file, the entry and exit logs are written at
+                        debug level
 
         Output      :   An entry log information is written to log file
         On Failure  :   Raise an exception
@@ -83,11 +311,15 @@ class App_Logger:
         start_method_name = self.start_log.__name__
 
         try:
-            func = lambda: "Entered" if key == "start" else "Exited"
-
-            log_msg = f"{func()} {method_name} method of class {class_name}"
-
-            self.log(log_msg, class_name, method_name, file, log_file)
+            self.write_log(
+                DEBUG,
+                "%s %s method of class %s",
+                ("Entered" if key == "start" else "Exited", method_name, class_name),
+                class_name,
+                method_name,
+                file,
+                log_file,
+            )
 
         except Exception as e:
             error_msg = f"Exception occured in Class : {class_name}, Method : {start_method_name}, Error : {str(e)}"
@@ -111,17 +343,8 @@ class App_Logger:
 
         exception_msg = f"Exception occured in Class : {class_name}, Method : {method_name}, Script : {filename}, Line : {exc_tb.tb_lineno}, Error : {str(exception)}"
 
-        log_file = self.get_log_file(log_file)
-
-        basicConfig(filename=log_file, **self.log_params)
-
-        error(
-            exception_msg,
-            extra={
-                "class_name": class_name,
-                "method_name": method_name,
-                "file_name": basename(file),
-            },
+        self.write_log(
+            ERROR, exception_msg, None, class_name, method_name, file, log_file
         )
 
         raise Exception(exception_msg)
@@ -129,7 +352,9 @@ class App_Logger:
     def stop_log(self):
         """
         Method Name :   stop_log
-        Description :   This method stops the logging for the system by exiting all the existing handlers
+        Description :   This method stops the logging for the system, the log queue is drained by the writer thread
+                        and the log files of the process are closed. logging.shutdown is not called, since in a
+                        forked child it would flush the handlers of the parent
 
         Output      :   Logging of information is stopped by python logger
         On Failure  :   Write an exception log and then raise an exception
@@ -138,7 +363,7 @@ class App_Logger:
         Revisions   :   moved setup to cloud
         """
         try:
-            shutdown()
+            _stop_listener()
 
         except Exception as e:
             raise e
@@ -0,0 +1,241 @@
+import gc
+import os
+import signal
+import socket
+from time import sleep
+
+import uvicorn
+
+from utils.logger import App_Logger
+from utils.read_params import get_log_dic, read_params
+
+
+class Prefork_Server:
+    """
+    Description :   This class shall be used for serving the app with several uvicorn workers which share the memory
+                    of the parent. The parent loads the production model and preprocessing pipeline once, freezes
+                    the gc so that the loaded objects are not written to by collections, binds the socket and forks
+                    the workers. The workers share the pages of the parent copy on write, and a worker which exits
+                    is forked again
+    Version     :   1.2
+    Revisions   :   moved setup to cloud
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+        self.config = read_params()
+
+        self.host = self.config["app"]["host"]
+
+        self.port = self.config["app"]["port"]
+
+        self.n_workers = self.config["app"]["workers"]
+
+        self.app_server_log = self.config["log"]["app_server"]
+
+        self.workers = {}
+
+        self.should_exit = False
+
+        self.log_writer = App_Logger()
+
+    def bind_socket(self):
+        """
+        Method Name :   bind_socket
+        Description :   This method binds the listening socket in the parent, the socket is inherited by the workers
+                        and the kernel spreads the connections over them
+
+        Output      :   The listening socket is returned
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+
+        sock.bind((self.host, self.port))
+
+        sock.listen(2048)
+
+        sock.set_inheritable(True)
+
+        return sock
+
+    def spawn_worker(self, worker_id, sock):
+        """
+        Method Name :   spawn_worker
+        Description :   This method forks a worker which serves the app with uvicorn on the inherited socket
+
+        Output      :   A worker is forked and its pid is saved
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.spawn_worker.__name__,
+            __file__,
+            self.app_server_log,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            pid = os.fork()
+
+            if pid == 0:
+                self.run_worker(worker_id, sock)
+
+            self.workers[pid] = worker_id
+
+            self.log_writer.log(f"Forked worker {worker_id} with pid {pid}", **log_dic)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def run_worker(self, worker_id, sock):
+        """
+        Method Name :   run_worker
+        Description :   This method is run in the forked worker, it serves the app with uvicorn on the inherited
+                        socket and exits the worker process when uvicorn stops, after the log queue is drained. The
+                        worker never returns to the code of the parent
+
+        Output      :   The app is served by the worker until it is stopped
+        On Failure  :   Write an exception log and exit the worker with status 1
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.run_worker.__name__,
+            __file__,
+            self.app_server_log,
+        )
+
+        exit_status = 1
+
+        try:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+            os.environ["APP_WORKER_ID"] = str(worker_id)
+
+            server = uvicorn.Server(
+                uvicorn.Config(self.app, host=self.host, port=self.port)
+            )
+
+            server.run(sockets=[sock])
+
+            exit_status = 0
+
+        except Exception as e:
+            try:
+                self.log_writer.exception_log(e, **log_dic)
+
+            except Exception:
+                pass
+
+        finally:
+            try:
+                self.log_writer.stop_log()
+
+            finally:
+                os._exit(exit_status)
+
+    def handle_exit(self, sig, frame):
+        """
+        Method Name :   handle_exit
+        Description :   This method is the signal handler of the parent, it stops the workers so that the parent
+                        exits once they have exited
+
+        Output      :   The workers are sent the signal
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        self.should_exit = True
+
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+
+            except ProcessLookupError:
+                pass
+
+    def run(self, preload):
+        """
+        Method Name :   run
+        Description :   This method runs preload in the parent, freezes the gc and forks the workers. The parent then
+                        waits on the workers and forks a worker again a second after it exits, until the parent is
+                        stopped
+
+        Output      :   The app is served by the workers
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.run.__name__, __file__, self.app_server_log
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            preload()
+
+            gc.collect()
+
+            gc.freeze()
+
+            self.log_writer.log(
+                f"Preloaded app and froze {gc.get_freeze_count()} objects", **log_dic
+            )
+
+            sock = self.bind_socket()
+
+            signal.signal(signal.SIGTERM, self.handle_exit)
+
+            signal.signal(signal.SIGINT, self.handle_exit)
+
+            for worker_id in range(self.n_workers):
+                self.spawn_worker(worker_id, sock)
+
+            self.log_writer.log(
+                f"Serving on {self.host}:{self.port} with {self.n_workers} workers",
+                **log_dic,
+            )
+
+            while len(self.workers) > 0:
+                pid, status = os.wait()
+
+                worker_id = self.workers.pop(pid, None)
+
+                if worker_id is None:
+                    continue
+
+                self.log_writer.log(
+                    f"Worker {worker_id} with pid {pid} exited with status {status}",
+                    **log_dic,
+                )
+
+                if self.should_exit is False:
+                    sleep(1)
+
+                    self.spawn_worker(worker_id, sock)
+
+            sock.close()
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
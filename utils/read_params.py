@@ -1,10 +1,173 @@
+import os
+import threading
+
 import yaml
 
+ENV_PREFIX = "AIR_PRESSURE__"
+
+_config_lock = threading.Lock()
+
+_config_cache = {}
+
+
+def _reset_after_fork():
+    global _config_lock
+
+    _config_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+class Frozen_Dict(dict):
+    """
+    Description :   This class shall be used for the mappings of the cached config, the config is shared by every
+                    caller in the process so it can not be changed in place. dict(...) gives a mutable copy
+    Version     :   1.2
+    Revisions   :   moved setup to cloud
+    """
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("Config read from params.yaml can not be changed in place")
+
+    __setitem__ = __delitem__ = _readonly
+
+    clear = pop = popitem = setdefault = update = _readonly
+
+    __ior__ = _readonly
+
+    def __reduce__(self):
+        return self.__class__, (dict(self),)
+
+
+class Frozen_List(list):
+    """
+    Description :   This class shall be used for the lists of the cached config, list(...) gives a mutable copy
+    Version     :   1.2
+    Revisions   :   moved setup to cloud
+    """
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("Config read from params.yaml can not be changed in place")
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _readonly
+
+    append = clear = extend = insert = pop = remove = reverse = sort = _readonly
+
+    def __reduce__(self):
+        return self.__class__, (list(self),)
+
+
+def freeze_config(obj):
+    """
+    Method Name :   freeze_config
+    Description :   This method converts the dicts and lists of the config into frozen dicts and frozen lists
+
+    Output      :   The frozen config is returned
+    On Failure  :   Raise an exception
+
+    Version     :   1.2
+    Revisions   :   moved setup to cloud
+    """
+    if isinstance(obj, dict):
+        return Frozen_Dict((key, freeze_config(value)) for key, value in obj.items())
+
+    if isinstance(obj, list):
+        return Frozen_List(freeze_config(value) for value in obj)
+
+    return obj
+
+
+def get_env_overrides():
+    """
+    Method Name :   get_env_overrides
+    Description :   This method gets the params overridden by environment variables, a variable named like
+                    AIR_PRESSURE__APP__PORT=9000 overrides config["app"]["port"], the value is parsed as yaml
+
+    Output      :   A sorted tuple of (variable name, value) of the overrides is returned
+    On Failure  :   Raise an exception
+
+    Version     :   1.2
+    Revisions   :   moved setup to cloud
+    """
+    return tuple(
+        sorted(
+            (name, value)
+            for name, value in os.environ.items()
+            if name.startswith(ENV_PREFIX)
+        )
+    )
+
+
+def apply_env_overrides(config, env_overrides):
+    """
+    Method Name :   apply_env_overrides
+    Description :   This method sets the overridden params in the config, each part of the variable name is matched
+                    to an existing key ignoring case and treating - as _, a part which does not match any key is
+                    added in lower case
+
+    Output      :   The params are overridden in the config
+    On Failure  :   Raise an exception
+
+    Version     :   1.2
+    Revisions   :   moved setup to cloud
+    """
+    for name, value in env_overrides:
+        section = config
+
+        parts = name[len(ENV_PREFIX) :].split("__")
+
+        for i, part in enumerate(parts):
+            if not isinstance(section, dict):
+                raise Exception(f"{name} does not match a section of params")
+
+            key = next(
+                (
+                    k
+                    for k in section
+                    if str(k).lower().replace("-", "_") == part.lower()
+                ),
+                part.lower(),
+            )
+
+            if i == len(parts) - 1:
+                section[key] = yaml.safe_load(value)
+
+            else:
+                section = section.setdefault(key, {})
+
+
+def load_params(config_path, env_overrides):
+    """
+    Method Name :   load_params
+    Description :   This method parses the params.yaml file, applies the environment variable overrides and
+                    validates the params against the params schema
+
+    Output      :   The frozen config is returned
+    On Failure  :   Raise an exception
+
+    Version     :   1.2
+    Revisions   :   moved setup to cloud
+    """
+    from utils.config_schema import Params_Schema
+
+    with open(config_path) as f:
+        config = yaml.load(f, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
+
+    apply_env_overrides(config, env_overrides)
+
+    Params_Schema.parse_obj(config)
+
+    return freeze_config(config)
+
 
 def read_params(config_path="params.yaml"):
     """
     Method Name :   read_params
-    Description :   This method reads the parameters from params.yaml file
+    Description :   This method reads the parameters from params.yaml file. The file is parsed once per process and
+                    the config is shared by the later calls, it is parsed again when the mtime or size of the file
+                    changes. The environment variable overrides are applied when the file is parsed. The config is
+                    immutable
 
     Output      :   Parameters are read from the params.yaml file
     On Failure  :   Write an exception log and then raise an exception
@@ -15,10 +178,24 @@ def read_params(config_path="params.yaml"):
     method_name = read_params.__name__
 
     try:
-        with open(config_path) as f:
-            config = yaml.safe_load(f)
+        stat = os.stat(config_path)
+
+        cache_key = (stat.st_mtime_ns, stat.st_size)
+
+        cached = _config_cache.get(config_path)
+
+        if cached is not None and cached[0] == cache_key:
+            return cached[1]
+
+        with _config_lock:
+            cached = _config_cache.get(config_path)
+
+            if cached is None or cached[0] != cache_key:
+                cached = (cache_key, load_params(config_path, get_env_overrides()))
+
+                _config_cache[config_path] = cached
 
-        return config
+        return cached[1]
 
     except Exception as e:
         raise Exception(